@@ -0,0 +1,232 @@
+# FeltPy benchmarks: how fast the package talks to a Felt API, measured against the local mock server (feltpy.mockserver)
+# Measures import time, getLayers and getMapElements (calls per second, p50/p99 latency, peak memory),
+# and postLayer for GeoDataFrames of different sizes (upload throughput and peak memory)
+# Each case is run in its own process, so that the peak memory of one doesn't hide another's, and the results are written as JSON
+# Usage: python benchmarks/bench.py [--quick] [--cases getLayers,postLayer] [--upload-sizes 10000,5000000] [--no-alloc] [--output results.json] [--compare old.json]
+
+# Importing other useful packages
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import datetime
+
+# Running from a checkout, rather than an installed copy, is the usual case
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+### MEASURING ###
+
+# Purpose: find the peak memory use of this process so far
+# Returns megabytes
+def _peakRSS():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024*1024) if sys.platform == "darwin" else peak / 1024
+
+# Purpose: find a percentile of a list of timings
+# Returns the value, in milliseconds
+def _percentile(seconds: list, q: float):
+    ordered = sorted(seconds)
+    return 1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# Purpose: find the most memory allocated at once during a single call of a function
+# Returns megabytes, as counted by tracemalloc (which includes numpy's arrays)
+# NOTE: tracemalloc slows calls down, so this is done on a separate call from the timed ones (and skipped with --no-alloc)
+def _peakAllocated(func):
+    if os.environ.get("FELTPY_BENCH_NO_ALLOC"):
+        return None
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / (1024*1024)
+    finally:
+        tracemalloc.stop()
+
+# Purpose: time a function over many calls, from several threads at once
+# func: the function to call
+# calls: how many calls to make in total
+# threads: how many threads to make them from
+# Returns a dict of calls_per_sec, p50_ms, p99_ms, seconds (the total), and peak_alloc_mb (see _peakAllocated)
+# NOTE: the function is called once first, untimed, so that imports and connections are already set up
+def _timeCalls(func, calls: int, threads: int=1):
+    from concurrent.futures import ThreadPoolExecutor
+    func()
+    def timed(_):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        seconds = list(executor.map(timed, range(calls)))
+    total = time.perf_counter() - start
+    return {"calls": calls, "threads": threads, "calls_per_sec": calls / total,
+            "p50_ms": _percentile(seconds, 0.5), "p99_ms": _percentile(seconds, 0.99), "seconds": total, "peak_alloc_mb": _peakAllocated(func)}
+
+### CASES ###
+# Each one runs in a child process, against the server at api_url, and returns a dict of measurements
+
+# Purpose: how long "import feltpy" takes in a fresh interpreter
+def benchImport(api_url, repeats: int=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import feltpy"], check=True, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+    # The time to start an interpreter that imports nothing, so it can be taken off
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    baseline = time.perf_counter() - start
+    return {"min_ms": 1000 * min(times), "median_ms": _percentile(times, 0.5), "interpreter_ms": 1000 * baseline}
+
+# Purpose: calls per second and latency of getLayers on a map with a number of layers
+def benchGetLayers(api_url, map_id, layers: int, calls: int, threads: int):
+    import feltpy
+    client = feltpy.FeltClient("bench", pool_size=threads, api_url=api_url)
+    return _timeCalls(lambda: client.getLayers(map_id), calls, threads)
+
+# Purpose: calls per second, latency, and decode throughput of getMapElements for a number of elements
+def benchGetMapElements(api_url, map_id, elements: int, calls: int, fast: bool):
+    import feltpy
+    client = feltpy.FeltClient("bench", api_url=api_url)
+    metrics = feltpy.MetricsCollector()
+    client.hooks.append(metrics)
+    result = _timeCalls(lambda: client.getMapElements(map_id, fast=fast), calls)
+    # Every call gets the same payload
+    summary = metrics.summary()[0]
+    result["mb_per_sec"] = summary["response_bytes"] / summary["count"] * calls / (1024*1024) / result["seconds"]
+    return result
+
+# Purpose: upload throughput of postLayer for a GeoDataFrame of points
+def benchPostLayer(api_url, map_id, features: int, format: str, stream: bool):
+    import numpy
+    import geopandas
+    import feltpy
+    rng = numpy.random.default_rng(0)
+    gdf = geopandas.GeoDataFrame({"value": rng.random(features), "label": numpy.arange(features).astype(str)},
+                                 geometry=geopandas.points_from_xy(rng.uniform(-180, 180, features), rng.uniform(-85, 85, features)), crs=4326)
+    client = feltpy.FeltClient("bench", api_url=api_url)
+    upload = lambda: client.postLayer(map_id, gdf, "bench", verbose=False, format=format, stream=stream)
+    start = time.perf_counter()
+    layer = upload()
+    seconds = time.perf_counter() - start
+    uploaded = sum(u.bytes for u in layer.uploads)
+    return {"seconds": seconds, "bytes": uploaded, "mb_per_sec": uploaded / (1024*1024) / seconds, "features_per_sec": features / seconds,
+            "peak_alloc_mb": _peakAllocated(upload)}
+
+_case_functions = {"import": benchImport, "getLayers": benchGetLayers, "getMapElements": benchGetMapElements, "postLayer": benchPostLayer}
+
+# Purpose: run a single case in this process, printing its result as JSON (called by the parent process)
+def _runChild(case, params):
+    result = _case_functions[case](**params)
+    result["peak_rss_mb"] = _peakRSS()
+    print(json.dumps(result))
+
+### RUNNING ###
+
+# Purpose: run a case in a fresh process
+# Returns the dict of measurements (or of the error, if it failed)
+def _runCase(case, params):
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", case, json.dumps(params)],
+                               capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# Purpose: describe where the benchmarks were run, so results from different machines aren't mixed up
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+# The measurement compared by --compare for each case, and whether higher is better
+_headline = {"import": ("median_ms", False), "getLayers": ("calls_per_sec", True),
+             "getMapElements": ("calls_per_sec", True), "postLayer": ("mb_per_sec", True)}
+
+# Purpose: print how each result changed since an earlier run
+# old: the path of the earlier run's JSON
+# results: this run's results
+# threshold: the change (as a share) above which a result is flagged
+def _compare(old, results, threshold: float=0.1):
+    with open(old) as file_obj:
+        previous = {json.dumps([r["case"], r["params"]], sort_keys=True): r for r in json.load(file_obj)["results"]}
+    for r in results:
+        before = previous.get(json.dumps([r["case"], r["params"]], sort_keys=True))
+        key, higher_is_better = _headline[r["case"]]
+        if not before or key not in before or key not in r:
+            continue
+        change = (r[key] - before[key]) / before[key]
+        worse = change < -threshold if higher_is_better else change > threshold
+        print(f"{'REGRESSION ' if worse else ''}{r['case']} {r['params']}: {key} {before[key]:.4g} -> {r[key]:.4g} ({change:+.1%})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark feltpy against a local mock Felt API")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer calls, for a fast check")
+    parser.add_argument("--cases", default=",".join(_case_functions), help="comma-separated cases to run")
+    parser.add_argument("--upload-sizes", default=None, help="comma-separated feature counts for postLayer (default 10000,100000,1000000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency for the mock server to add to each request")
+    parser.add_argument("--output", default=None, help="where to write the JSON results (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--no-alloc", action="store_true", help="skip measuring peak allocations, which re-runs each case under tracemalloc")
+    parser.add_argument("--compare", default=None, help="the JSON results of an earlier run, to print the changes since then")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return _runChild(args.child[0], json.loads(args.child[1]))
+
+    from feltpy.mockserver import MockFeltServer
+    if args.no_alloc:
+        os.environ["FELTPY_BENCH_NO_ALLOC"] = "1"
+    cases = args.cases.split(",")
+    element_sizes = [1000, 10000] if args.quick else [1000, 10000, 100000]
+    upload_sizes = [int(n) for n in args.upload_sizes.split(",")] if args.upload_sizes else ([10000] if args.quick else [10000, 100000, 1000000])
+    calls = 200 if args.quick else 2000
+
+    results = []
+    with MockFeltServer(latency=args.latency) as server:
+        # One map for each size of elements, so the server only encodes each payload once
+        layers_map = server.addMap("Layers")
+        for i in range(50):
+            server.addLayer(layers_map, f"Layer {i}")
+        plan = []
+        if "import" in cases:
+            plan.append(("import", {}))
+        if "getLayers" in cases:
+            for threads in (1, 8):
+                plan.append(("getLayers", {"map_id": layers_map, "layers": 50, "calls": calls, "threads": threads}))
+        if "getMapElements" in cases:
+            for n in element_sizes:
+                elements_map = server.addMap(f"Elements {n}")
+                server.setElements(elements_map, n)
+                for fast in (True, False):
+                    plan.append(("getMapElements", {"map_id": elements_map, "elements": n, "calls": max(3, min(50, 200000 // n)), "fast": fast}))
+        if "postLayer" in cases:
+            upload_map = server.addMap("Uploads")
+            for n in upload_sizes:
+                for format in ("geojson", "parquet"):
+                    plan.append(("postLayer", {"map_id": upload_map, "features": n, "format": format, "stream": True}))
+        for case, params in plan:
+            result = _runCase(case, {**params, "api_url": server.api_url})
+            # Map IDs differ between runs, so they are left out of the recorded parameters
+            recorded = {k: v for k, v in params.items() if k != "map_id"}
+            results.append({"case": case, "params": recorded, **result})
+            summary = ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items())
+            print(f"{case} {recorded}: {summary}")
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file_obj:
+        json.dump({"meta": _metadata(), "results": results}, file_obj, indent=2)
+    print("Results written to", output)
+    if args.compare:
+        _compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# Allows running the command line with python -m feltpy (see cli.py)
+import sys
+
+from .cli import main
+
+sys.exit(main())
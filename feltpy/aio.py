@@ -0,0 +1,446 @@
+# FeltPy asyncio API: async versions of the endpoint functions in feltpy.py
+# Every function here mirrors the blocking function of the same name, and returns the same classes
+# Requires aiohttp, which can be installed with: pip install feltpy[aio]
+
+# Importing other useful packages
+import asyncio
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError("feltpy.aio requires aiohttp - install it with: pip install feltpy[aio]") from e
+
+from . import feltpy as _feltpy
+from .feltpy import (_requestHeaders, _process_error, _print, _emit, _endpointTemplate, RequestEvent, _rateLimiterFor, _backoff, _retryAfter, _idempotent_methods,
+                     _userFromJSON, _mapFromJSON, _layerFromJSON, _layerPatchData,
+                     _upload_formats, _encodedGeoDataFrame, _smallestFormat,
+                     LayerCollection, Layer, FileUpload)
+
+### CLIENT ###
+# A reusable, concurrency-limited connection to the Felt API
+
+# Class type for AsyncFeltClients, which hold a personal access token and a pooled aiohttp.ClientSession
+# pat: the user's personal access token
+# limit: the maximum number of requests that can be in flight at once
+# timeout: seconds to wait on the server, either a single number or a (connect, read) tuple
+# retries: how many times to retry a request that was rate limited (429), or an idempotent one that failed with a 5xx or connection error
+# rate_limiter: the RateLimiter to send requests through - by default, the one shared by everything using this pat (see feltpy.setRateLimit)
+# hooks: a list of callables passed a RequestEvent after each of this client's requests and uploads, on top of those registered with feltpy.addHook
+# api_url: the base URL of the API to send requests to - by default, Felt's (see feltpy.mockserver for a local stand-in)
+# Every function in this module accepts an AsyncFeltClient in place of the pat, and is also available as a method here
+# Should be used as an async context manager (or closed with close()), so that the session is cleaned up
+class AsyncFeltClient:
+    # Info is created on initialization
+    def __init__(self, pat, limit: int=100, timeout=(10, 60), retries: int=3, rate_limiter=None, hooks: list=None, api_url: str=None):
+        self.pat = pat
+        self.limit = limit
+        self.timeout = timeout
+        self.retries = retries
+        self.rate_limiter = rate_limiter or _rateLimiterFor(pat)
+        self.hooks = list(hooks or [])
+        self.api_url = api_url.rstrip("/") + "/{endpoint}" if api_url else _feltpy._felt_api
+        # Headers are only built once, instead of on every request
+        self._headers = _requestHeaders(pat)
+        # The session and semaphore are made on first use, as they need a running event loop
+        self._session = None
+        self._semaphore = None
+    # Creates the session the first time it is needed
+    def _getSession(self):
+        if self._session is None:
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit),
+                                                  timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read))
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._session
+    # Sends a request to the Felt API, returning the JSON (if successful) or printing out the relevant Felt error message
+    # Mirrors _getRequest, _postRequest, _patchRequest, and _deleteRequest
+    # Requests wait their turn with the rate limiter, and are retried (see retries) after a 429, 5xx, or dropped connection
+    # Once the request is done, a RequestEvent is passed to each hook (see feltpy.addHook)
+    async def _request(self, method, endpoint, data=None):
+        session = self._getSession()
+        idempotent = method in _idempotent_methods
+        hooks = self.hooks + _feltpy._hooks if self.hooks or _feltpy._hooks else None
+        async with self._semaphore:
+            start = time.perf_counter()
+            waited = 0.0
+            for attempt in range(self.retries + 1):
+                retry = attempt < self.retries
+                # Waiting on the event loop for the rate limiter to allow another request
+                wait = self.rate_limiter._tryAcquire()
+                while wait > 0:
+                    waited += wait
+                    await asyncio.sleep(wait)
+                    wait = self.rate_limiter._tryAcquire()
+                try:
+                    response = await session.request(method, self.api_url.format(endpoint=endpoint), headers=self._headers, json=data)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if not (idempotent and retry):
+                        if hooks:
+                            _emit(hooks, RequestEvent("request", method, _endpointTemplate(endpoint), None, time.perf_counter()-start, waited, None, None, attempt, repr(e)))
+                        raise
+                    await asyncio.sleep(_backoff(attempt))
+                    continue
+                # A 429 means the request was not carried out, so any method can be retried - everyone sharing the pat also holds off
+                if response.status == 429:
+                    self.rate_limiter.block(_retryAfter(response) or _backoff(attempt))
+                    if retry:
+                        response.release()
+                        continue
+                elif response.status >= 500 and idempotent and retry:
+                    response.release()
+                    await asyncio.sleep(_backoff(attempt))
+                    continue
+                break
+            async with response:
+                body = await response.read()
+            if hooks:
+                _emit(hooks, RequestEvent("request", method, _endpointTemplate(endpoint), response.status, time.perf_counter()-start, waited,
+                                          len(json.dumps(data).encode()) if data is not None else 0, len(body), attempt))
+        # DELETE requests do not return anything, so only whether they succeeded is returned
+        if method == "DELETE" and response.status in (200, 204):
+            return True
+        # If it is a 200, then the information was successfully retrieved
+        if response.status == 200:
+            return json.loads(body)
+        # If it is a 204, then the upload was successful
+        elif response.status == 204 and method == "POST":
+            _print("File upload successful")
+        elif response.status in range(400,500):
+            _process_error(json.loads(body))
+        else:
+            _print("Unexpected error occured:", response.status)
+            _print(body.decode(errors="replace"))
+    # Sends a file to a presigned upload URL, returning the status code and text of the response
+    # NOTE: the Felt headers are not sent here, as the URL does not point to the Felt API
+    async def _upload(self, url, presigned_attributes, file_name, content):
+        session = self._getSession()
+        form = aiohttp.FormData()
+        for k, v in presigned_attributes.items():
+            form.add_field(k, v)
+        form.add_field("file", content, filename=file_name)
+        hooks = self.hooks + _feltpy._hooks if self.hooks or _feltpy._hooks else None
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, data=form) as response:
+                    status, text = response.status, await response.text()
+            except Exception as e:
+                if hooks:
+                    _emit(hooks, RequestEvent("upload", "POST", "upload", None, time.perf_counter()-start, 0.0, len(content), None, 0, repr(e)))
+                raise
+        if hooks:
+            _emit(hooks, RequestEvent("upload", "POST", "upload", status, time.perf_counter()-start, 0.0, len(content), len(text.encode()), 0))
+        return status, text
+    # Closes all pooled connections
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, *args):
+        await self.close()
+
+    # Methods to call all of the module's functions with this client
+    async def getUserInfo(self):
+        return await getUserInfo(self)
+    async def getMapInfo(self, map_id):
+        return await getMapInfo(self, map_id)
+    async def getMapElements(self, map_id):
+        return await getMapElements(self, map_id)
+    async def getMapComments(self, map_id):
+        return await getMapComments(self, map_id)
+    async def getLayers(self, map_id):
+        return await getLayers(self, map_id)
+    async def getLayer(self, map_id, layer_id):
+        return await getLayer(self, map_id, layer_id)
+    async def postMap(self, title: str=None, basemap: str="default", layer_urls: list=[], lat: float=0.0, lon: float=0.0, zoom: float=10.0):
+        return await postMap(self, title, basemap, layer_urls, lat, lon, zoom)
+    async def postLayer(self, map_id, file, name: str, process: bool=True, verbose: bool=True, format: str="geojson"):
+        return await postLayer(self, map_id, file, name, process, verbose, format)
+    async def postWebLayer(self, map_id, url: str, name: str="Untitled Layer"):
+        return await postWebLayer(self, map_id, url, name)
+    async def patchLayer(self, map_id, layer_id, name: str=None, description: str=None, visible: bool=None):
+        return await patchLayer(self, map_id, layer_id, name, description, visible)
+    async def deleteMap(self, map_id):
+        return await deleteMap(self, map_id)
+    async def deleteLayer(self, map_id, layer_id):
+        return await deleteLayer(self, map_id, layer_id)
+
+# Default AsyncFeltClients used by the free functions, as a dict of event loop to (dict of pat to client, the loop's _closeWithLoop generator)
+# A session can only be used on the loop it was made on, so each loop gets its own, and they are closed and dropped when the loop shuts down
+_default_clients = {}
+_default_clients_lock = threading.Lock()
+
+# Purpose: close the default AsyncFeltClients of an event loop once it shuts down
+# loop: the event loop
+# clients: the dict of pat to AsyncFeltClient made for it
+# NOTE: this is an async generator that waits at its yield - event loops close every unfinished async generator as they shut down
+# (asyncio.run does this with loop.shutdown_asyncgens), which runs the finally block while the loop can still close the sessions
+async def _closeWithLoop(loop, clients):
+    try:
+        yield
+    finally:
+        with _default_clients_lock:
+            if _default_clients.get(loop, (None,))[0] is clients:
+                del _default_clients[loop]
+        for client in list(clients.values()):
+            await client.close()
+
+# Purpose: find the AsyncFeltClient that should be used to send a request
+# pat: the user's personal access token, or an AsyncFeltClient
+# Yields the AsyncFeltClient itself if one was passed, otherwise the default AsyncFeltClient for the pat on the running event loop
+# NOTE: calls made with the same pat share connections and the concurrency limit, as with the blocking functions
+@contextlib.asynccontextmanager
+async def _client(pat):
+    if isinstance(pat, AsyncFeltClient):
+        yield pat
+        return
+    loop = asyncio.get_running_loop()
+    closer = None
+    with _default_clients_lock:
+        if loop not in _default_clients:
+            clients = {}
+            closer = _closeWithLoop(loop, clients)
+            _default_clients[loop] = (clients, closer)
+        clients = _default_clients[loop][0]
+        client = clients.get(pat)
+        if client is None:
+            client = AsyncFeltClient(pat)
+            clients[pat] = client
+    # Starting the generator that closes the clients, so that the loop knows to close it when it shuts down
+    if closer is not None:
+        await closer.__anext__()
+    yield client
+
+# Purpose: close the default AsyncFeltClients made for the running event loop
+# NOTE: this happens on its own when the loop shuts down through asyncio.run, so it is only needed for loops that are
+# closed without calling loop.shutdown_asyncgens(), or to close the connections sooner
+# Does not return anything
+async def closeDefaultClients():
+    with _default_clients_lock:
+        entry = _default_clients.get(asyncio.get_running_loop())
+    if entry is not None:
+        await entry[1].aclose()
+
+### GET REQUESTS ###
+# All functions that require a GET request to perform
+
+# Purpose: return information about the current user
+# pat: the user's personal access token, or an AsyncFeltClient
+# Returns a User class
+async def getUserInfo(pat):
+    async with _client(pat) as client:
+        user_info = await client._request("GET", "user/")
+    if user_info:
+        return _userFromJSON(user_info["data"])
+
+# Purpose: return information about a map
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# Returns a Map class
+async def getMapInfo(pat, map_id):
+    async with _client(pat) as client:
+        map_info = await client._request("GET", f"maps/{map_id}")
+    if map_info:
+        return _mapFromJSON(map_info["data"])
+
+# Purpose: retrieves the feature collection of all the elements in a map
+# NOTE: this does NOT mean the data that powers layers - this refers to drawings, text, notes, etc.
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# Returns a Geopandas GeoDataFrame of all the elements
+async def getMapElements(pat, map_id):
+    async with _client(pat) as client:
+        map_elements = await client._request("GET", f"maps/{map_id}/elements")
+    if map_elements:
+        import geopandas
+        return geopandas.GeoDataFrame.from_features(map_elements["data"])
+
+# Purpose: retrieves all of the comments in a map
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# Returns a JSON of all the elements
+async def getMapComments(pat, map_id):
+    async with _client(pat) as client:
+        map_comments = await client._request("GET", f"maps/{map_id}/comments/export")
+    if map_comments:
+        return map_comments
+
+# Purpose: retrieves all of the layers of a map
+# NOTE: Only retrieves metadata, not actual data
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# Returns a LayerCollection of all the elements
+async def getLayers(pat, map_id):
+    async with _client(pat) as client:
+        map_layers = await client._request("GET", f"maps/{map_id}/layers")
+    if map_layers:
+        return LayerCollection(map_id = map_id, layers = map_layers)
+
+# Purpose: retrieves the information for a single layer
+# NOTE: Only retrieves metadata, not actual data
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# layer_id: the ID of the layer
+# Returns a Layer
+async def getLayer(pat, map_id, layer_id):
+    async with _client(pat) as client:
+        map_layer = await client._request("GET", f"maps/{map_id}/layers/{layer_id}")
+    if map_layer:
+        return _layerFromJSON(map_layer["data"], map_id)
+
+### POST REQUESTS ###
+# All functions that require a POST request to perform
+
+# Purpose: make a new blank map
+# pat: the user's personal access token, or an AsyncFeltClient
+# See feltpy.postMap for the other parameters
+# Returns a Map object if the map was successfully created
+async def postMap(pat, title: str=None, basemap: str="default", layer_urls: list=[], lat: float=0.0, lon: float=0.0, zoom: float=10.0):
+    data = {
+        "title": title,
+        "basemap": basemap,
+        "layer_urls": layer_urls,
+        "lat": lat,
+        "lon": lon,
+        "zoom": zoom
+    }
+    async with _client(pat) as client:
+        map_info = await client._request("POST", "maps/", data)
+    if map_info:
+        return _mapFromJSON(map_info["data"])
+
+# Purpose: to upload a layer to S3
+# pat: the user's personal access token, or an AsyncFeltClient
+# See feltpy.postLayer for the other parameters
+# NOTE: GeoDataFrames are re-projected and encoded in a worker thread, so the event loop is not blocked
+# Returns the (still processing) Layer, with how the file was uploaded under uploads, or None if any step failed
+async def postLayer(pat, map_id, file, name: str, process: bool=True, verbose: bool=True, format: str="geojson"):
+    loop = asyncio.get_running_loop()
+    # If file is a string, check that it corresponds to a file
+    if isinstance(file, str):
+        if os.path.exists(file):
+            file_name = os.path.basename(file)
+        else:
+            _print("File does not exist - check path and retry")
+            return None
+    # Otherwise, it is a GeoDataFrame, so create a dummy name for it, with the extension of the format it will be sent in
+    else:
+        if format == "auto":
+            format = await loop.run_in_executor(None, _smallestFormat, file)
+        if format not in _upload_formats:
+            _print(f"Unknown format {format} - must be one of {list(_upload_formats)} or auto")
+            return None
+        file_name = re.sub(r"[^\w]", "_", "gdf_"+name) + _upload_formats[format]
+
+    async with _client(pat) as client:
+        # First, requesting the bucket to upload the data to
+        upload_request = await client._request("POST", f"maps/{map_id}/layers", {"file_names": [file_name], "name": name})
+        if not upload_request:
+            return None
+        presigned_attributes = upload_request["data"]["attributes"]["presigned_attributes"]
+        upload_url = upload_request["data"]["attributes"]["url"]
+        layer_id = upload_request["data"]["attributes"]["layer_id"]
+        # Then, uploading the data itself
+        if isinstance(file, str):
+            content = await loop.run_in_executor(None, _readFile, file)
+        else:
+            content = await loop.run_in_executor(None, _encodeFrame, file, format, os.path.splitext(file_name)[0]+".geojson")
+        start = time.perf_counter()
+        status, text = await client._upload(upload_url, presigned_attributes, file_name, content)
+        upload = FileUpload(file_name, len(content), time.perf_counter()-start, status, None if status == 204 else text)
+
+        # Checking that the upload was successful
+        if status != 204:
+            _print("Layer upload not successful! Check the following message and try again")
+            _print(text)
+            return None
+        if verbose:
+            _print(f"Uploaded {file_name}: {upload.bytes} bytes in {upload.seconds:.2f}s")
+        if process == True:
+            upload_response = await client._request("POST", f"maps/{map_id}/layers/{layer_id}/finish_upload", {"filename": file_name})
+            # upload_response is a dictionary - if successfull, the "data" key is set to None
+            if upload_response is None:
+                return None
+            elif not upload_response["data"]:
+                if verbose:
+                    _print("Processing started, check back later to see if it is complete")
+            else:
+                _print("Processing failed")
+                _print(upload_response)
+                return None
+    return Layer(type = "layer",
+                 id = layer_id,
+                 name = name,
+                 status = None,
+                 map_id = map_id,
+                 datasets = None,
+                 uploads = [upload])
+
+# Reads the full contents of a file (run in a worker thread by postLayer)
+def _readFile(path):
+    with open(path, "rb") as file_obj:
+        return file_obj.read()
+
+# Encodes a GeoDataFrame in the given format, returning the bytes (run in a worker thread by postLayer)
+def _encodeFrame(gdf, format, inner_name):
+    with _encodedGeoDataFrame(gdf, format, inner_name=inner_name) as file_obj:
+        return file_obj.read()
+
+# Purpose: to upload a layer hosted elsewhere on the internet
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# url: the URL that points to the content to upload
+# name: what to name the layer
+# Returns a Layer
+async def postWebLayer(pat, map_id, url: str, name: str="Untitled Layer"):
+    async with _client(pat) as client:
+        layer_upload = await client._request("POST", f"maps/{map_id}/layers/url_import", {"layer_url": url, "name": name})
+    if layer_upload:
+        return Layer(type = layer_upload["data"]["type"],
+                     id = layer_upload["data"]["id"],
+                     name = name,
+                     status = None,
+                     map_id = map_id,
+                     datasets = None)
+
+### PATCH REQUESTS ###
+# All functions that require a PATCH request to perform
+
+# Purpose: Updates the details of a layer
+# pat: the user's personal access token, or an AsyncFeltClient
+# See feltpy.patchLayer for the other parameters
+# Returns a Layer
+async def patchLayer(pat, map_id, layer_id, name: str=None, description: str=None, visible: bool=None):
+    data = _layerPatchData(name, description, visible)
+    async with _client(pat) as client:
+        patch_layer = await client._request("PATCH", f"maps/{map_id}/layers/{layer_id}", data)
+    if patch_layer:
+        return _layerFromJSON(patch_layer["data"], map_id)
+
+### DELETE REQUESTS ###
+# All functions that require a DELETE request to perform
+
+# Purpose: Deletes a map
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# Returns True if the map was deleted
+async def deleteMap(pat, map_id):
+    async with _client(pat) as client:
+        return await client._request("DELETE", f"maps/{map_id}")
+
+# Purpose: Deletes a layer within a map
+# pat: the user's personal access token, or an AsyncFeltClient
+# map_id: the ID of the map
+# layer_id: the ID of the layer
+# Returns True if the layer was deleted
+async def deleteLayer(pat, map_id, layer_id):
+    async with _client(pat) as client:
+        return await client._request("DELETE", f"maps/{map_id}/layers/{layer_id}")
@@ -0,0 +1,436 @@
+# FeltPy command line: bulk operations on Felt maps, run with parallel workers and live progress
+# Installed as the "feltpy" command (and also runnable with python -m feltpy):
+#   feltpy upload <dir|glob|file>... --map MAP_ID [--workers N]
+#   feltpy layers ls --map MAP_ID
+#   feltpy layers rm --map MAP_ID --older-than 7d
+#   feltpy elements export --map MAP_ID --stream [-o elements.geojson]
+# The personal access token is read from --token or the FELT_TOKEN environment variable
+# Exit codes: 0 if everything succeeded, 1 if anything failed, 2 for bad arguments, 130 if interrupted
+# NOTE: nothing here needs geopandas, so it is never imported, and the command starts quickly
+
+# Importing other useful packages
+import os
+import sys
+import glob
+import json
+import time
+import fnmatch
+import argparse
+import contextlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import feltpy as _feltpy
+
+### PROGRESS ###
+
+# Class type for Progress, a hook that counts bytes sent as files are uploaded, and prints a live line of progress to stderr
+# total: how many items are expected (None if not known)
+# unit: what the items are called, e.g. "layers"
+# enabled: whether to show the live line - by default, only when stderr is a terminal
+class _Progress:
+    # Info is created on initialization
+    def __init__(self, total: int=None, unit: str="layers", enabled: bool=None):
+        self.total = total
+        self.unit = unit
+        self.enabled = sys.stderr.isatty() if enabled is None else enabled
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.failed_requests = []
+        self._start = time.perf_counter()
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+    # Records a RequestEvent, counting the bytes of uploads and keeping the requests that failed
+    def __call__(self, event):
+        with self._lock:
+            if event.kind == "upload":
+                self.bytes += event.request_bytes or 0
+            if not event.ok:
+                self.failed_requests.append(event)
+        self._render()
+    # Records that an item finished
+    def step(self, ok: bool=True, n_bytes: int=0):
+        with self._lock:
+            self.done += 1
+            self.failed += not ok
+            self.bytes += n_bytes
+        self._render(force=True)
+    # Records bytes that were not sent through an upload (e.g. written to a file)
+    def add(self, n_bytes: int, items: int=0):
+        with self._lock:
+            self.bytes += n_bytes
+            self.done += items
+        self._render()
+    # The progress line
+    def line(self):
+        seconds = max(time.perf_counter() - self._start, 1e-9)
+        done = f"{self.done}/{self.total}" if self.total is not None else str(self.done)
+        text = f"{done} {self.unit} | "
+        if self.bytes:
+            text += f"{self.bytes / (1024*1024):.1f} MB | {self.bytes / (1024*1024) / seconds:.2f} MB/s | "
+        text += f"{self.done / seconds * 60:.1f} {self.unit}/min"
+        return text + (f" | {self.failed} failed" if self.failed else "")
+    # Re-draws the live line, at most a few times a second
+    def _render(self, force: bool=False):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if force or now - self._last_render >= 0.2:
+            self._last_render = now
+            sys.stderr.write("\r\033[K" + self.line())
+            sys.stderr.flush()
+    # Prints a message on its own line, without breaking up the live line
+    def message(self, text: str, file=None):
+        with self._lock:
+            if self.enabled:
+                sys.stderr.write("\r\033[K")
+            print(text, file=file or sys.stdout, flush=True)
+        self._render(force=True)
+    # Prints the final line, and any requests that the API answered with an error
+    # (requests that got no answer at all raise, and are reported with the item they were for)
+    def finish(self):
+        if self.enabled:
+            sys.stderr.write("\r\033[K")
+        print(self.line(), file=sys.stderr)
+        answered = [event for event in self.failed_requests if event.status]
+        for event in answered[:10]:
+            print(f"  failed request: {event.method} {event.endpoint} {event.status}", file=sys.stderr)
+        if len(answered) > 10:
+            print(f"  ... and {len(answered) - 10} more", file=sys.stderr)
+
+### HELPERS ###
+
+# Purpose: make a FeltClient for a command, from its arguments
+# Returns the client, or None (after printing why) if there is no token
+def _client(args, progress=None):
+    token = args.token or os.environ.get("FELT_TOKEN")
+    if not token:
+        print("No token given - pass --token or set FELT_TOKEN", file=sys.stderr)
+        return None
+    return _feltpy.FeltClient(token, pool_size=max(10, args.workers), api_url=args.api_url, hooks=[progress] if progress else None)
+
+# The extensions of the files Felt can make layers from, which are the only ones picked up from directories and glob patterns by default
+# (zipped Shapefiles, .shp.zip, are covered by .zip)
+_upload_extensions = (".geojson", ".json", ".zip", ".fgb", ".parquet", ".gpkg", ".csv", ".kml", ".kmz", ".gpx", ".tif", ".tiff")
+
+# Purpose: find the files to upload from a list of directories, glob patterns, and paths
+# paths: the arguments given
+# pattern: a pattern that the names of files found in directories and glob patterns must match - by default, any with one of _upload_extensions
+# skip: paths to never upload, such as the manifest (and its lock file)
+# Returns a list of file paths, in a stable order, without duplicates
+# NOTE: files named on their own are always included (unless skipped), as they were asked for
+def _findFiles(paths: list, pattern: str=None, skip: list=()):
+    skip = {os.path.abspath(p) for p in skip}
+    # Whether a file found by looking through a directory or glob pattern should be uploaded
+    def wanted(path):
+        name = os.path.basename(path)
+        if name.startswith(".") or not os.path.isfile(path):
+            return False
+        return fnmatch.fnmatch(name, pattern) if pattern else name.lower().endswith(_upload_extensions)
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(p for p in (os.path.join(path, f) for f in os.listdir(path)) if wanted(p)))
+        elif glob.has_magic(path):
+            found.extend(sorted(p for p in glob.glob(path, recursive=True) if wanted(p)))
+        else:
+            found.append(path)
+    return [p for p in dict.fromkeys(found) if os.path.abspath(p) not in skip]
+
+# Purpose: turn an age such as "90m", "12h", "7d", or "2w" (or a number of seconds) into seconds
+# Returns the number of seconds
+def _parseAge(text: str):
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    text = text.strip().lower()
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+# Purpose: find when a layer was created (or last updated), as a UNIX timestamp
+# layer_json: the layer's JSON from the API
+# uploaded: dict of layer ID to when it was uploaded (from an UploadManifest), used when the API doesn't give a time
+# Returns the timestamp, or None if it is not known
+def _layerTime(layer_json, uploaded: dict=None):
+    attributes = layer_json.get("attributes") or {}
+    for key in ("created_at", "updated_at"):
+        value = attributes.get(key)
+        if isinstance(value, (int, float)):
+            # Some timestamps are in milliseconds
+            return value / 1000 if value > 1e11 else value
+        if isinstance(value, str):
+            try:
+                return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                pass
+    return (uploaded or {}).get(layer_json["id"])
+
+# Purpose: describe an exception (such as the API being unreachable) on a single line
+def _describe(error):
+    text = str(error).strip().splitlines()
+    return f"{type(error).__name__}: {text[0]}" if text else type(error).__name__
+
+# Purpose: get the raw JSON of the layers of several maps, at the same time
+# Returns a dict of map ID to its list of layers, leaving out maps that could not be read
+def _mapLayers(client, map_ids: list, workers: int):
+    # Reads the layers of one map, returning None (after printing why) if they could not be read
+    def read(map_id):
+        try:
+            response = _feltpy._getRequest(client, f"maps/{map_id}/layers", use_cache=False)
+        except Exception as e:
+            print(f"Could not read the layers of map {map_id}: {_describe(e)}", file=sys.stderr)
+            return None
+        if response is None:
+            print("Could not read the layers of map", map_id, file=sys.stderr)
+        return response
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(map_ids)))) as executor:
+        responses = dict(zip(map_ids, executor.map(read, map_ids)))
+    return {m: r["data"] for m, r in responses.items() if r is not None}
+
+### COMMANDS ###
+
+# Purpose: upload every file found as its own layer
+def _upload(args):
+    # The manifest is often kept next to the data, so it (and its lock file) is never uploaded
+    files = _findFiles(args.paths, args.pattern, [args.manifest, args.manifest + ".lock"] if args.manifest else [])
+    missing = [f for f in files if not os.path.isfile(f)]
+    if missing:
+        print("File does not exist:", missing[0], file=sys.stderr)
+        return 2
+    if not files:
+        print("No files found to upload", file=sys.stderr)
+        return 2
+    progress = _Progress(len(files), "layers", None if args.progress is None else args.progress)
+    client = _client(args, progress)
+    if client is None:
+        return 2
+    # Every file is its own layer, so the files are spread across the workers
+    def upload(path):
+        name = args.name_prefix + os.path.splitext(os.path.basename(path))[0]
+        return path, _feltpy.postLayer(client, args.map, path, name, verbose=False, workers=1, retries=args.retries,
+                                       wait=args.wait, manifest=args.manifest)
+    failed = 0
+    with client, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(upload, path): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            # A file that raises (e.g. the API can't be reached) only fails itself, not the files after it
+            try:
+                layer = future.result()[1]
+            except Exception as e:
+                failed += 1
+                progress.step(False)
+                progress.message(f"FAILED    {path}: {_describe(e)}")
+                continue
+            ok = layer is not None and layer.status != "failed"
+            failed += not ok
+            progress.step(ok)
+            # Layers skipped by the manifest come back without any uploads
+            action = "FAILED   " if not ok else "uploaded " if layer.uploads else "unchanged"
+            progress.message(f"{action} {path}" + (f" -> {layer.id}" if layer is not None else ""))
+    progress.finish()
+    return 1 if failed else 0
+
+# Purpose: list the layers of one or more maps
+def _layersList(args):
+    client = _client(args)
+    if client is None:
+        return 2
+    with client:
+        layers = _mapLayers(client, args.map, args.workers)
+    for map_id in args.map:
+        for layer in layers.get(map_id, []):
+            attributes = layer.get("attributes") or {}
+            if args.json:
+                print(json.dumps({"map_id": map_id, "id": layer["id"], **attributes}))
+            else:
+                print("\t".join(str(v) for v in (map_id, layer["id"], attributes.get("status"), attributes.get("name"))))
+    return 0 if len(layers) == len(args.map) else 1
+
+# Purpose: delete the layers of one or more maps that match all of the filters given
+def _layersRemove(args):
+    if args.older_than is None and args.name is None and args.status is None:
+        print("Refusing to delete every layer - give at least one of --older-than, --name, or --status", file=sys.stderr)
+        return 2
+    client = _client(args)
+    if client is None:
+        return 2
+    # Reading the manifest once, rather than once for each layer
+    uploaded = {}
+    if args.manifest:
+        try:
+            entries = _feltpy.UploadManifest(args.manifest).entries()
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        uploaded = {entry.get("layer_id"): entry.get("uploaded") for entry in entries.values()}
+    cutoff = time.time() - _parseAge(args.older_than) if args.older_than is not None else None
+    with client:
+        layers = _mapLayers(client, args.map, args.workers)
+        selected, unknown_age = [], 0
+        for map_id, map_layers in layers.items():
+            for layer in map_layers:
+                attributes = layer.get("attributes") or {}
+                if args.name is not None and not fnmatch.fnmatch(attributes.get("name") or "", args.name):
+                    continue
+                if args.status is not None and attributes.get("status") != args.status:
+                    continue
+                if cutoff is not None:
+                    created = _layerTime(layer, uploaded)
+                    if created is None:
+                        unknown_age += 1
+                        continue
+                    if created > cutoff:
+                        continue
+                selected.append((map_id, layer["id"], attributes.get("name")))
+        if unknown_age:
+            print(f"Skipped {unknown_age} layers whose age is not known (pass the --manifest they were uploaded with)", file=sys.stderr)
+        for map_id, layer_id, name in selected:
+            print(f"{'would delete' if args.dry_run else 'deleting'}\t{map_id}\t{layer_id}\t{name}")
+        if args.dry_run or not selected:
+            return 0 if len(layers) == len(args.map) else 1
+        if not args.yes:
+            if not sys.stdin.isatty():
+                print("Pass --yes to delete without being asked", file=sys.stderr)
+                return 2
+            if input(f"Delete {len(selected)} layers? [y/N] ").strip().lower() not in ("y", "yes"):
+                return 1
+        progress = _Progress(len(selected), "layers", args.progress)
+        results = _feltpy.deleteLayers(client, [(m, l) for m, l, _ in selected], workers=args.workers, confirm=args.confirm)
+        failed = 0
+        for result in results:
+            ok = result.ok and result.confirmed is not False
+            failed += not ok
+            progress.step(ok)
+            if not ok:
+                progress.message(f"FAILED\t{result.item[0]}\t{result.item[1]}\t{result.error or 'still on the map'}", file=sys.stderr)
+    progress.finish()
+    return 1 if failed or len(layers) != len(args.map) else 0
+
+# Purpose: write the elements of one or more maps as GeoJSON
+def _elementsExport(args):
+    if len(args.map) > 1 and (args.output is None or not os.path.isdir(args.output)):
+        print("Exporting several maps needs --output to be an existing directory", file=sys.stderr)
+        return 2
+    progress = _Progress(None, "features", args.progress)
+    client = _client(args, progress)
+    if client is None:
+        return 2
+    extension = ".geojsonl" if args.format == "geojsonseq" else ".geojson"
+    # Writes the elements of one map, returning whether it succeeded
+    def export(map_id):
+        path = os.path.join(args.output, map_id + extension) if len(args.map) > 1 else args.output
+        with (open(path, "wb") if path else _stdout()) as file_obj:
+            if args.stream:
+                # Writing each feature as soon as it is parsed, so only one is held in memory
+                features = _feltpy.getMapElements(client, map_id, stream=True, batch_size=1000)
+                head, separator, tail = (b"", b"\n", b"\n") if args.format == "geojsonseq" else (b'{"type": "FeatureCollection", "features": [', b", ", b"]}\n")
+                file_obj.write(head)
+                written = 0
+                for batch in features:
+                    chunk = separator.join(json.dumps(feature).encode() for feature in batch)
+                    file_obj.write(separator + chunk if written else chunk)
+                    written += len(batch)
+                    progress.add(len(chunk), len(batch))
+                if args.format == "geojsonseq" and not written:
+                    tail = b""
+                file_obj.write(tail)
+                return True
+            content = _feltpy._getRequest(client, f"maps/{map_id}/elements", raw=True)
+            if content is None:
+                return False
+            collection = json.loads(content)["data"]
+            features = collection["features"] if isinstance(collection, dict) else collection
+            if args.format == "geojsonseq":
+                body = b"".join(json.dumps(feature).encode() + b"\n" for feature in features)
+            else:
+                body = json.dumps({"type": "FeatureCollection", "features": features}).encode() + b"\n"
+            file_obj.write(body)
+            progress.add(len(body), len(features))
+            return True
+    failed = 0
+    with client, ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(args.map)))) as executor:
+        for map_id, future in zip(args.map, [executor.submit(export, m) for m in args.map]):
+            try:
+                ok = future.result()
+            except Exception as e:
+                progress.message(f"FAILED {map_id}: {_describe(e)}", file=sys.stderr)
+                ok = False
+            failed += not ok
+    progress.finish()
+    # A streamed download that fails just stops early, so its failed request is what shows it
+    return 1 if failed or progress.failed_requests else 0
+
+# Purpose: write to stdout as bytes, without closing it afterwards
+def _stdout():
+    return contextlib.nullcontext(sys.stdout.buffer)
+
+### PARSER ###
+
+# Purpose: build the argument parser, with a sub-command for each command
+def _parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--token", help="personal access token (default: the FELT_TOKEN environment variable)")
+    common.add_argument("--api-url", default=os.environ.get("FELT_API_URL"), help="base URL of the API (default: Felt's)")
+    common.add_argument("--workers", type=int, default=8, help="how many requests to run at the same time (default: 8)")
+    common.add_argument("--progress", dest="progress", action="store_true", default=None, help="always show live progress")
+    common.add_argument("--no-progress", dest="progress", action="store_false", help="never show live progress")
+    common.add_argument("--verbose", action="store_true", help="also print the library's own messages")
+
+    parser = argparse.ArgumentParser(prog="feltpy", description="Bulk operations on Felt maps")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    upload = commands.add_parser("upload", parents=[common], help="upload files, each as its own layer")
+    upload.add_argument("paths", nargs="+", help="files, directories, or glob patterns (quote them to use ** )")
+    upload.add_argument("--map", required=True, help="ID of the map to upload to")
+    upload.add_argument("--pattern", help="only upload files found in directories and glob patterns whose names match this (default: any of " + " ".join(_upload_extensions) + ")")
+    upload.add_argument("--name-prefix", default="", help="text to put before each file's name to make its layer name")
+    upload.add_argument("--retries", type=int, default=2, help="how many more times to try sending a file that fails")
+    upload.add_argument("--wait", action="store_true", help="wait for each layer to finish processing")
+    upload.add_argument("--manifest", help="skip files that haven't changed since they were uploaded with this manifest")
+    upload.set_defaults(func=_upload)
+
+    layers = commands.add_parser("layers", help="list or delete layers").add_subparsers(dest="layers_command", metavar="command")
+    layers.required = True
+    ls = layers.add_parser("ls", parents=[common], help="list the layers of maps")
+    ls.add_argument("--map", required=True, action="append", help="ID of a map (can be given more than once)")
+    ls.add_argument("--json", action="store_true", help="print one JSON object per layer")
+    ls.set_defaults(func=_layersList)
+    rm = layers.add_parser("rm", parents=[common], help="delete the layers of maps that match all of the filters")
+    rm.add_argument("--map", required=True, action="append", help="ID of a map (can be given more than once)")
+    rm.add_argument("--older-than", help="only layers older than this, such as 90m, 12h, 7d, or 2w")
+    rm.add_argument("--name", help="only layers whose name matches this pattern, such as 'tmp_*'")
+    rm.add_argument("--status", help="only layers with this status, such as failed")
+    rm.add_argument("--manifest", help="manifest the layers were uploaded with, to find their ages if Felt doesn't give them")
+    rm.add_argument("--confirm", action="store_true", help="check that the layers are gone afterwards")
+    rm.add_argument("--dry-run", action="store_true", help="only list the layers that would be deleted")
+    rm.add_argument("--yes", "-y", action="store_true", help="don't ask before deleting")
+    rm.set_defaults(func=_layersRemove)
+
+    elements = commands.add_parser("elements", help="export elements").add_subparsers(dest="elements_command", metavar="command")
+    elements.required = True
+    export = elements.add_parser("export", parents=[common], help="write the elements of maps as GeoJSON")
+    export.add_argument("--map", required=True, action="append", help="ID of a map (can be given more than once)")
+    export.add_argument("--output", "-o", help="file to write to (default: stdout), or a directory when exporting several maps")
+    export.add_argument("--format", choices=["geojson", "geojsonseq"], default="geojson", help="a FeatureCollection, or one feature per line")
+    export.add_argument("--stream", action="store_true", help="write features as they arrive, instead of downloading them all first (needs ijson)")
+    export.set_defaults(func=_elementsExport)
+    return parser
+
+# Purpose: run the command line
+# argv: the arguments (default: sys.argv[1:])
+# Returns the exit code
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    if args.workers < 1:
+        print("--workers must be at least 1", file=sys.stderr)
+        return 2
+    # The library's messages would break up the progress line, so failures are reported from the results instead
+    _feltpy.setQuiet(not args.verbose)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
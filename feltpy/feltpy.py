@@ -1,18 +1,88 @@
 # FeltPy: a wrapper for the public API from Felt.com
 
+# Annotations are kept as strings, so that geopandas does not need to be imported to define postLayer
+from __future__ import annotations
+
 # Importing other useful packages
+import sys
+import importlib
 import requests 
 import re 
 import os
-import geopandas 
+import io
+import json
+import uuid
+import shutil
+import zipfile
+import tempfile
+import time
+import heapq
+import random
+import itertools
+import bisect
+import threading
+import contextlib
+import logging
+import hashlib
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 ### INTERNAL ###
 # These functions and variables are not meant for external use
 # They simply help other functions perform their job
 
+# Class type for modules that are only imported the first time one of their attributes is used
+# name: the name of the module to import
+class _LazyModule:
+    # Info is created on initialization
+    def __init__(self, name):
+        self._name = name
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+# geopandas (along with pandas, shapely, and pyproj) is slow to import, so it is only imported once it is needed
+geopandas = _LazyModule("geopandas")
+
+# Purpose: check whether an object is a GeoDataFrame, without importing geopandas
+# obj: the object to check
+# Returns True if obj is a GeoDataFrame (which can only be the case if geopandas was already imported)
+def _isGeoDataFrame(obj):
+    return "geopandas" in sys.modules and isinstance(obj, sys.modules["geopandas"].GeoDataFrame)
+
+# Whether messages are printed (see setQuiet)
+_quiet = False
+
+# Purpose: print a message, unless printing was turned off with setQuiet
+# Takes the same arguments as print
+def _print(*args, **kwargs):
+    if not _quiet:
+        print(*args, **kwargs)
+
 # Saving the URL of a felt request, with flexibility for the endpoint
 _felt_api = "https://felt.com/api/v1/{endpoint}"
 
+# Default FeltClients, one per personal access token, used by the free functions
+# Created the first time a pat is used, so that every later call reuses its pooled connections
+_default_clients = {}
+_default_clients_lock = threading.Lock()
+
+# Purpose: find the FeltClient that should be used to send a request
+# pat: the user's personal access token, or a FeltClient
+# Returns the FeltClient itself if one was passed, otherwise the default FeltClient for the pat
+def _getClient(pat):
+    # Clients are used as-is
+    if isinstance(pat, FeltClient):
+        return pat
+    # Otherwise, looking up (or creating) the default client for this pat
+    with _default_clients_lock:
+        client = _default_clients.get(pat)
+        if client is None:
+            client = FeltClient(pat)
+            _default_clients[pat] = client
+    return client
+
 # Purpose: format the header for any request that should be sent out
 # pat: the user's personal access token
 # Returns a formatted dictionary with Content-Type and Authorization headers
@@ -26,57 +96,128 @@ def _requestHeaders(pat):
     return headers
 
 # Purpose: format and send a GET request to the specified endpoint
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # endpoint: the desired action's endpoint
+# use_cache: whether a cached response can be used, if the client has a ResponseCache
+# raw: whether to return the undecoded bytes of the response, instead of parsing it as JSON
 # Will return either a JSON (if the action was successful) or print out the relevant Felt error message
-def _getRequest(pat, endpoint):
-    # Getting headers
-    headers = _requestHeaders(pat)
-    # Querying the endpoint
-    response = requests.get(_felt_api.format(endpoint=endpoint), headers=headers)
+def _getRequest(pat, endpoint, use_cache: bool=True, raw: bool=False):
+    client = _getClient(pat)
+    cache = client.cache
+    # Checking the cache first, if there is one
+    entry = None
+    if cache is not None and use_cache:
+        entry = cache.lookup(endpoint)
+        if entry is not None and entry.fresh():
+            return entry.value
+    # If an expired response has an ETag, asking the server whether it has changed instead of re-downloading it
+    headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+    # Querying the endpoint through the (pooled) client for this pat
+    response = client._request("GET", endpoint, headers=headers)
     # Checking the response
+    # If it is a 304, the cached response is still correct
+    if response.status_code == 304 and entry is not None:
+        cache.revalidated(endpoint)
+        return entry.value
     # If it is a 200, then the information was successfully retrieved
     if response.status_code == 200:
-        return response.json()
+        if raw:
+            return response.content
+        value = response.json()
+        if cache is not None:
+            cache.store(endpoint, value, response.headers.get("ETag"))
+        return value
     elif response.status_code in range(400,500):
         _process_error(response.json())
     else:
-        print("Unexpected error occured:", response.status_code)
-        print(response.text)
+        _print("Unexpected error occured:", response.status_code)
+        _print(response.text)
+
+# Purpose: send a GET request, and parse the items of a JSON array out of the response as it arrives
+# pat: the user's personal access token, or a FeltClient
+# endpoint: the desired action's endpoint
+# prefixes: the possible locations of the array's items, in ijson's dotted notation (e.g. "data.item")
+# batch_size: if set, yields lists of up to this many items instead of one item at a time
+# Yields each item as it is parsed, so only one item (or batch) is held in memory at a time, or prints out the relevant Felt error message
+# NOTE: requires ijson, which can be installed with: pip install feltpy[stream]
+def _streamRequest(pat, endpoint, prefixes, batch_size: int=None):
+    import ijson
+    from ijson.common import ObjectBuilder
+    # Querying the endpoint, without downloading the body up front
+    with _getClient(pat)._request("GET", endpoint, stream=True) as response:
+        # Checking the response
+        if response.status_code in range(400,500):
+            _process_error(response.json())
+            return
+        elif response.status_code != 200:
+            _print("Unexpected error occured:", response.status_code)
+            _print(response.text)
+            return
+        # Reading (and un-compressing, if needed) the body straight from the connection
+        response.raw.decode_content = True
+        batch = []
+        builder, depth = None, 0
+        for prefix, event, value in ijson.parse(response.raw, use_float=True):
+            # Adding to the item currently being built, until it is closed
+            if builder is not None:
+                builder.event(event, value)
+                if event in ("start_map", "start_array"):
+                    depth += 1
+                elif event in ("end_map", "end_array"):
+                    depth -= 1
+                if depth > 0:
+                    continue
+                item, builder = builder.value, None
+            # Starting a new item
+            elif prefix in prefixes:
+                if event in ("start_map", "start_array"):
+                    builder, depth = ObjectBuilder(), 1
+                    builder.event(event, value)
+                    continue
+                item = value
+            else:
+                continue
+            # Handing back the finished item, on its own or in a batch
+            if batch_size:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            else:
+                yield item
+        if batch:
+            yield batch
 
 # Purpose: format and send a POST request to the specified endpoint
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # endpoint: the desired action's endpoint
 # data: dict of parameters to pass too
+# priority: how soon the request should be sent when rate limited, compared to others (see RateLimiter)
 # Will return either a JSON (if the action was successful) or print out the relevant Felt error message
-def _postRequest(pat, endpoint, data):
-    # Getting headers
-    headers = _requestHeaders(pat)
-    # Querying the endpoint
-    response = requests.post(_felt_api.format(endpoint=endpoint), headers=headers, json=data)
+def _postRequest(pat, endpoint, data, priority: int=None):
+    # Querying the endpoint through the (pooled) client for this pat
+    response = _getClient(pat)._request("POST", endpoint, data, priority=priority)
     # Checking the response
     # If it is a 200, then the information was successfully retrieved
     if response.status_code == 200:
         return response.json()
     # If it is a 204, then the upload was successfl
     elif response.status_code == 204:
-        print("File upload successful")
+        _print("File upload successful")
     elif response.status_code in range(400,500):
         _process_error(response.json())
     else:
-        print("Unexpected error occured:", response.status_code)
-        print(response.text)
+        _print("Unexpected error occured:", response.status_code)
+        _print(response.text)
 
 # Purpose: format and send a PATCH request to the specified endpoint
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # endpoint: the desired action's endpoint
 # data: dict of parameters to pass too
 # Will return either a JSON (if the action was successful) or print out the relevant Felt error message
 def _patchRequest(pat, endpoint, data):
-    # Getting headers
-    headers = _requestHeaders(pat)
-    # Querying the endpoint
-    response = requests.patch(_felt_api.format(endpoint=endpoint), headers=headers, json=data)
+    # Querying the endpoint through the (pooled) client for this pat
+    response = _getClient(pat)._request("PATCH", endpoint, data)
     # Checking the response
     # If it is a 200, then the information was successfully retrieved
     if response.status_code == 200:
@@ -84,18 +225,25 @@ def _patchRequest(pat, endpoint, data):
     elif response.status_code in range(400,500):
         _process_error(response.json())
     else:
-        print("Unexpected error occured:", response.status_code)
-        print(response.text)
+        _print("Unexpected error occured:", response.status_code)
+        _print(response.text)
 
 # Purpose: format and send a DELETE request to the specified endpoint
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # endpoint: the desired action's endpoint
-# Will return either a JSON (if the action was successful) or print out the relevant Felt error message
+# Will return either True (if the action was successful) or print out the relevant Felt error message
 def _deleteRequest(pat, endpoint):
-    # Getting headers
-    headers = _requestHeaders(pat)
-    # Querying the endpoint
-    response = requests.delete(_felt_api.format(endpoint=endpoint), headers=headers)
+    # Querying the endpoint through the (pooled) client for this pat
+    response = _getClient(pat)._request("DELETE", endpoint)
+    # Checking the response
+    # If it is a 200 or 204, then the object was deleted
+    if response.status_code in (200, 204):
+        return True
+    elif response.status_code in range(400,500):
+        _process_error(response.json())
+    else:
+        _print("Unexpected error occured:", response.status_code)
+        _print(response.text)
 
 # Purpose: take in an JSON response error that was returned by a request, format, and print it
 # error: the json response
@@ -111,15 +259,482 @@ def _process_error(error):
     for e in error["errors"]:
         for k,v in dict_error_response.items():
             try:
-                print(v, e[k])
+                _print(v, e[k])
             except:
                 pass
 
+# Purpose: take in an JSON response error that was returned by a request, and format it as a single line
+# error: the json response
+# Returns a string of every error's title and details
+def _errorMessage(error):
+    try:
+        return "; ".join(": ".join(str(e[k]) for k in ("title", "detail") if k in e) for e in error["errors"])
+    except (KeyError, TypeError):
+        return str(error)
+
+# Purpose: send a request as part of a batch, without printing anything
+# client: the FeltClient to send the request with
+# method: the HTTP method
+# endpoint: the desired action's endpoint
+# data: dict of parameters to pass too
+# Returns a tuple of the status code, the JSON (if there was any), and an error message (None if successful)
+def _batchRequest(client, method, endpoint, data=None):
+    try:
+        response = client._request(method, endpoint, data, priority=PRIORITY_BULK)
+    except requests.RequestException as e:
+        return None, None, repr(e)
+    try:
+        body = response.json() if response.content else None
+    except ValueError:
+        body = None
+    if response.status_code in (200, 204):
+        return response.status_code, body, None
+    return response.status_code, body, _errorMessage(body) if body else response.text
+
+# Purpose: build the parameters for updating a layer, leaving out the ones that were not given
+# Returns a dict of the parameters
+# NOTE: only None counts as not given, so visible=False and description="" are still sent
+def _layerPatchData(name: str=None, description: str=None, visible: bool=None):
+    data = {}
+    for k,v in zip(["name","description","visible"], [name, description, visible]):
+        if v is not None:
+            data[k] = v
+    return data
+
+# Purpose: create a User from the "data" of a JSON response
+# user_json: the JSON object describing the user
+# Returns a User
+def _userFromJSON(user_json):
+    return User(type = user_json["type"],
+                id = user_json["id"],
+                name = user_json["attributes"]["name"],
+                email = user_json["attributes"]["email"])
+
+# Purpose: create a Map from the "data" of a JSON response
+# map_json: the JSON object describing the map
+# Returns a Map
+def _mapFromJSON(map_json):
+    return Map(type = map_json["type"],
+               id = map_json["id"],
+               title = map_json["attributes"]["title"],
+               url = map_json["attributes"]["url"])
+
+# Purpose: create a Layer from the "data" of a JSON response
+# layer_json: the JSON object describing the layer
+# map_id: the ID of the map the layer belongs to
+# Returns a Layer
+def _layerFromJSON(layer_json, map_id):
+    return Layer(type = layer_json["type"],
+                 id = layer_json["id"],
+                 name = layer_json["attributes"]["name"],
+                 status = layer_json["attributes"]["status"],
+                 map_id = map_id,
+                 datasets = layer_json["relationships"]["datasets"],
+                 description = layer_json["attributes"].get("description"),
+                 visible = layer_json["attributes"].get("visible"))
+
+# Purpose: decode a GeoJSON response into a GeoDataFrame (or Arrow table) in bulk, rather than one feature at a time
+# content: the raw bytes of the response, whose "data" is a FeatureCollection or a list of features
+# as_arrow: whether to return a pyarrow Table, with geometries as WKB, instead of a GeoDataFrame
+# Returns the same columns as GeoDataFrame.from_features - "geometry", then every property, filled with None where missing
+# NOTE: uses orjson to parse if it is installed, and shapely's array functions to build every geometry at once
+def _decodeFeatures(content, as_arrow: bool=False):
+    import numpy
+    import shapely
+    try:
+        import orjson
+        loads, dumps = orjson.loads, orjson.dumps
+    except ImportError:
+        loads, dumps = json.loads, json.dumps
+    data = loads(content)["data"]
+    features = data["features"] if isinstance(data, dict) and data.get("type") == "FeatureCollection" else data
+    # Building all of the geometries in a single call
+    geometries = shapely.from_geojson(numpy.array([dumps(f["geometry"]) if f["geometry"] else None for f in features], dtype=object))
+    # Building the properties one column at a time, keeping the order they were first seen in
+    properties = [f.get("properties") or {} for f in features]
+    keys = dict.fromkeys(k for p in properties for k in p)
+    columns = {k: [p.get(k) for p in properties] for k in keys if k != "geometry"}
+    if as_arrow:
+        import pyarrow
+        wkb = pyarrow.field("geometry", pyarrow.binary(), metadata={"ARROW:extension:name": "geoarrow.wkb"})
+        # Starting from the geometries, so that the table has a row for every feature even when none of them have properties
+        table = pyarrow.Table.from_arrays([pyarrow.array(shapely.to_wkb(geometries), type=pyarrow.binary())], schema=pyarrow.schema([wkb]))
+        for k, v in columns.items():
+            table = table.append_column(k, pyarrow.array(v))
+        return table
+    return geopandas.GeoDataFrame({"geometry": geometries, **columns}, geometry="geometry")
+
+# Purpose: flatten the nested objects of a JSON object into a single level, joining keys with underscores
+# obj: the JSON object to flatten
+# prefix: text to put in front of every key
+# Returns a flat dict (lists are kept as they are)
+def _flattenJSON(obj, prefix: str=""):
+    flat = {}
+    for k, v in obj.items():
+        if isinstance(v, dict):
+            flat.update(_flattenJSON(v, f"{prefix}{k}_"))
+        else:
+            flat[f"{prefix}{k}"] = v
+    return flat
+
+# Purpose: turn the exported comment threads of a map into a table, with one row per comment
+# threads: the list of threads (or a dict with them under "data"), each holding its comments/replies in a list
+# Returns a pandas DataFrame with the thread's fields (prefixed with thread_), the comment's fields,
+# reply_index (0 for the comment that started the thread), and is_reply, with timestamps (columns ending in _at) parsed as UTC
+# NOTE: columns are built one at a time rather than row by row, and given pandas' nullable types
+def _commentsToDataFrame(threads):
+    import pandas
+    if isinstance(threads, dict):
+        threads = threads.get("data") or []
+    columns = {}
+    n_rows = 0
+    for thread in threads:
+        # The comments of a thread are its first list of objects - if there is none, the thread is a single comment
+        replies_key = next((k for k, v in thread.items() if isinstance(v, list) and v and all(isinstance(c, dict) for c in v)), None)
+        if replies_key:
+            thread_fields = _flattenJSON({k: v for k, v in thread.items() if k != replies_key and not isinstance(v, list)}, "thread_")
+            comments = thread[replies_key]
+        else:
+            thread_fields = {"thread_id": thread.get("id")}
+            comments = [thread]
+        for i, comment in enumerate(comments):
+            row = {**thread_fields, "reply_index": i, "is_reply": i > 0, **_flattenJSON(comment)}
+            # Adding each value to its column, starting new columns (filled with None for earlier rows) as keys appear
+            for k, v in row.items():
+                if k not in columns:
+                    columns[k] = [None] * n_rows
+                columns[k].append(v)
+            n_rows += 1
+            for column in columns.values():
+                if len(column) < n_rows:
+                    column.append(None)
+    df = pandas.DataFrame(columns)
+    # Parsing the columns of timestamps (Felt names them like created_at), leaving a column as it is if any of its values aren't one
+    for k in df.columns:
+        if k.endswith("_at") and (df[k].dtype == object or pandas.api.types.is_string_dtype(df[k])):
+            try:
+                df[k] = pandas.to_datetime(df[k], utc=True)
+            except (ValueError, TypeError, OverflowError):
+                pass
+    return df.convert_dtypes()
+
+# Purpose: lower the precision of and/or simplify every geometry of a GeoDataFrame at once, to make it smaller to upload
+# gdf: the GeoDataFrame (re-projected to EPSG:4326 first, if needed)
+# precision: how many decimal places to snap coordinates to (None to leave them as they are)
+# simplify: the tolerance, in degrees, to simplify geometries with, keeping their topology valid (None to not simplify)
+# chunk_size: how many geometries to measure the GeoJSON size of at once
+# Returns a new GeoDataFrame (in EPSG:4326), and a GeometryReduction with the vertices and GeoJSON bytes of the geometries before and after
+# NOTE: simplifying is done before snapping, and both run over the whole geometry array in shapely, rather than one geometry at a time
+# Snapping uses shapely.set_precision, which keeps geometries valid (parts that collapse are dropped) where plain rounding would not
+def _reduceGeometries(gdf, precision: int=None, simplify: float=None, chunk_size: int=50000):
+    import numpy
+    import shapely
+    gdf = gdf if _isWGS84(gdf.crs) else gdf.to_crs(4326)
+    before = numpy.asarray(gdf.geometry.array, dtype=object)
+    after = before
+    if simplify:
+        after = shapely.simplify(after, simplify, preserve_topology=True)
+    if precision is not None:
+        after = shapely.set_precision(after, 10**-precision)
+    reduced = gdf.copy(deep=False)
+    reduced[gdf.geometry.name] = geopandas.GeoSeries(after, index=gdf.index, crs=gdf.crs)
+    reduction = GeometryReduction(int(shapely.get_num_coordinates(before).sum()), int(shapely.get_num_coordinates(after).sum()),
+                                  _geoJSONSize(before, chunk_size), _geoJSONSize(after, chunk_size))
+    return reduced, reduction
+
+# Purpose: find how many bytes an array of geometries takes up as GeoJSON
+# geometries: the array of shapely geometries
+# chunk_size: how many geometries to serialize at once, so that only one chunk's strings are held in memory
+# Returns the number of bytes
+def _geoJSONSize(geometries, chunk_size: int=50000):
+    import shapely
+    total = 0
+    for start in range(0, len(geometries), chunk_size):
+        total += sum(len(g) for g in shapely.to_geojson(geometries[start:start+chunk_size]) if g)
+    return total
+
+# Purpose: check whether a CRS is already EPSG:4326, the CRS Felt expects uploads to be in
+# crs: the CRS of a GeoDataFrame
+# Returns True if no re-projection is needed
+def _isWGS84(crs):
+    return crs is not None and crs.equals("epsg:4326")
+
+# Purpose: serialize a GeoDataFrame to GeoJSON, one chunk of rows at a time
+# gdf: the GeoDataFrame to serialize
+# chunk_size: how many rows to re-project and serialize at once
+# Yields pieces of bytes that together make up a single FeatureCollection
+# NOTE: only one chunk is held in memory (and re-projected) at a time, and re-projection is skipped if already in EPSG:4326
+def _iterGeoJSON(gdf, chunk_size: int=50000):
+    reproject = not _isWGS84(gdf.crs)
+    yield b'{"type": "FeatureCollection", "features": ['
+    for start in range(0, len(gdf), chunk_size):
+        chunk = gdf.iloc[start:start+chunk_size]
+        if reproject:
+            chunk = chunk.to_crs(4326)
+        # Dumping the list of features, then stripping the brackets so chunks can be joined together
+        features = json.dumps(chunk.to_geo_dict()["features"])[1:-1]
+        if start > 0:
+            yield b", "
+        yield features.encode()
+    yield b"]}"
+
+# Purpose: write a GeoDataFrame to a temporary file as GeoJSON, one chunk at a time
+# gdf: the GeoDataFrame to serialize
+# chunk_size: how many rows to re-project and serialize at once
+# Returns a temporary file object (kept in memory while small, and moved to disk once large), rewound to the start
+def _spoolGeoJSON(gdf, chunk_size: int=50000):
+    file_obj = tempfile.SpooledTemporaryFile(max_size=64*1024*1024)
+    for piece in _iterGeoJSON(gdf, chunk_size):
+        file_obj.write(piece)
+    file_obj.seek(0)
+    return file_obj
+
+# The formats a GeoDataFrame can be encoded in before upload, and the file extension each one is sent with
+_upload_formats = {
+    "geojson": ".geojson",
+    "zip": ".zip",
+    "fgb": ".fgb",
+    "parquet": ".parquet"
+}
+
+# Purpose: write a GeoDataFrame to a temporary file in one of the _upload_formats
+# gdf: the GeoDataFrame to encode (re-projected to EPSG:4326 if needed)
+# format: one of "geojson", "zip" (zipped GeoJSON), "fgb" (FlatGeobuf), or "parquet" (GeoParquet)
+# chunk_size: how many rows to serialize at once for the GeoJSON-based formats
+# inner_name: the name of the GeoJSON file inside of the zip
+# Yields a binary file object, rewound to the start, which is cleaned up on exit
+# NOTE: "geojson" and "zip" are written chunk by chunk; "fgb" and "parquet" re-project and write the whole frame at once
+@contextlib.contextmanager
+def _encodedGeoDataFrame(gdf, format: str="geojson", chunk_size: int=50000, inner_name: str="data.geojson"):
+    if format == "geojson":
+        with _spoolGeoJSON(gdf, chunk_size) as file_obj:
+            yield file_obj
+    elif format == "zip":
+        with tempfile.SpooledTemporaryFile(max_size=64*1024*1024) as file_obj:
+            with zipfile.ZipFile(file_obj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                with zf.open(inner_name, "w") as zipped:
+                    for piece in _iterGeoJSON(gdf, chunk_size):
+                        zipped.write(piece)
+            file_obj.seek(0)
+            yield file_obj
+    elif format in ("fgb", "parquet"):
+        gdf = gdf if _isWGS84(gdf.crs) else gdf.to_crs(4326)
+        # These are written through GDAL/pyarrow, so a real path is used
+        tmp_dir = tempfile.mkdtemp(prefix="feltpy_")
+        try:
+            path = os.path.join(tmp_dir, "data"+_upload_formats[format])
+            if format == "fgb":
+                gdf.to_file(path, driver="FlatGeobuf")
+            else:
+                gdf.to_parquet(path)
+            with open(path, "rb") as file_obj:
+                yield file_obj
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        raise ValueError(f"Unknown upload format {format!r} - must be one of {list(_upload_formats)} or 'auto'")
+
+# Purpose: pick the format that will make the smallest upload for a GeoDataFrame
+# gdf: the GeoDataFrame to upload
+# sample_size: how many rows to test each format with
+# Returns the name of the smallest format, out of the ones that can be written in this environment
+# NOTE: sizes are compared on a sample of rows, so that the full frame is only encoded once
+def _smallestFormat(gdf, sample_size: int=10000):
+    sample = gdf.iloc[:sample_size]
+    sizes = {}
+    for format in _upload_formats:
+        try:
+            with _encodedGeoDataFrame(sample, format) as file_obj:
+                sizes[format] = file_obj.seek(0, os.SEEK_END)
+        # Formats whose writers are not installed (e.g. pyarrow for GeoParquet) are skipped
+        except Exception:
+            pass
+    return min(sizes, key=sizes.get)
+
+# Class type for streamed multipart/form-data bodies, used to send files to presigned upload URLs
+# Unlike requests' files= argument, the file is read from disk as it is sent instead of being copied into memory
+# fields: dict of form fields to send before the file (i.e. the presigned attributes)
+# file_name: the name to give the file in the form
+# file_obj: an open binary file object to send
+class _MultipartStream:
+    # Info is created on initialization
+    def __init__(self, fields, file_name, file_obj):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        # Everything before the file's contents
+        head = b"".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode() for k,v in fields.items())
+        head += f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode()
+        # Everything after the file's contents
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        # Finding the size of the file, so the total length can be sent up front (S3 does not accept chunked uploads)
+        file_obj.seek(0, os.SEEK_END)
+        size = file_obj.tell()
+        file_obj.seek(0)
+        self._parts = [io.BytesIO(head), file_obj, io.BytesIO(tail)]
+        self._length = len(head) + size + len(tail)
+    def __len__(self):
+        return self._length
+    # Reading the body piece by piece, moving on to the next part once one runs out
+    def read(self, size: int=-1):
+        data = b""
+        while self._parts and (size < 0 or len(data) < size):
+            piece = self._parts[0].read(-1 if size < 0 else size - len(data))
+            if piece:
+                data += piece
+            else:
+                self._parts.pop(0)
+        return data
+    def __iter__(self):
+        while True:
+            piece = self.read(64*1024)
+            if not piece:
+                return
+            yield piece
+
+# Purpose: send a single file to a presigned upload URL
+# client: the FeltClient to send the file with
+# upload_url: the URL to send the file to
+# presigned_attributes: the form fields that must be sent with the file
+# file_name: the name to send the file with
+# file: either a string path or a Geopandas GeoDataFrame
+# format: the format to encode a GeoDataFrame in (see _upload_formats)
+# stream: whether to stream the upload from disk, rather than building it in memory
+# chunk_size: how many rows of a GeoDataFrame to serialize at once
+# retries: how many more times to try sending the file if it fails
+# Returns a FileUpload, with error set to a message if the file was not uploaded
+def _uploadFile(client, upload_url, presigned_attributes, file_name, file, format, stream, chunk_size, retries: int=0):
+    for attempt in range(1, retries+2):
+        upload = _uploadFileOnce(client, upload_url, presigned_attributes, file_name, file, format, stream, chunk_size)
+        upload.attempts = attempt
+        if not upload.error:
+            break
+        # Waiting a little longer after each failure before trying again
+        if attempt <= retries:
+            time.sleep(min(2 ** attempt, 30))
+    return upload
+
+# Purpose: make a single attempt at sending a file to a presigned upload URL (see _uploadFile)
+def _uploadFileOnce(client, upload_url, presigned_attributes, file_name, file, format, stream, chunk_size):
+    start = time.perf_counter()
+    try:
+        # If the file is a string path, need to process as a file object
+        if type(file) == str:
+            size = os.path.getsize(file)
+            with open(file, "rb") as file_obj:
+                if stream:
+                    upload_action = client._upload(upload_url, stream=_MultipartStream(presigned_attributes, file_name, file_obj))
+                else:
+                    upload_action = client._upload(upload_url, files={**presigned_attributes, "file": (file_name, file_obj)})
+        # If the file is a GeoDataFrame, need to encode it (as GeoJSON by default), and upload that
+        elif stream or format != "geojson":
+            with _encodedGeoDataFrame(file, format, chunk_size, os.path.splitext(file_name)[0]+".geojson") as file_obj:
+                size = file_obj.seek(0, os.SEEK_END)
+                upload_action = client._upload(upload_url, stream=_MultipartStream(presigned_attributes, file_name, file_obj))
+        else:
+            gdf = file if _isWGS84(file.crs) else file.to_crs(4326)
+            content = gdf.to_json().encode()
+            size = len(content)
+            upload_action = client._upload(upload_url, files={**presigned_attributes, "file": (file_name, content)})
+    except Exception as e:
+        return FileUpload(file_name, 0, time.perf_counter()-start, None, repr(e))
+    error = None if upload_action.status_code == 204 else upload_action.text
+    return FileUpload(file_name, size, time.perf_counter()-start, upload_action.status_code, error)
+
+# Purpose: split a GeoDataFrame into shards that can be encoded and uploaded separately
+# gdf: the GeoDataFrame to split
+# shards: how many shards to make
+# shard_by: how rows are grouped into shards - one of:
+#   "rows": in their current order
+#   "grid": by which cell of a grid over the frame's extent their bounding box center falls in
+#   "hilbert": by their position along a Hilbert curve, which keeps each shard compact
+# Returns a list of GeoDataFrames, each with about the same number of rows
+def _shardGeoDataFrame(gdf, shards: int, shard_by: str="rows"):
+    import numpy
+    if shard_by == "rows":
+        order = numpy.arange(len(gdf))
+    elif shard_by == "hilbert":
+        order = numpy.argsort(gdf.geometry.hilbert_distance(), kind="stable")
+    elif shard_by == "grid":
+        # Using a square grid with at least as many cells as shards
+        side = int(numpy.ceil(numpy.sqrt(shards)))
+        bounds = gdf.geometry.bounds.to_numpy()
+        x = numpy.nan_to_num((bounds[:, 0] + bounds[:, 2]) / 2)
+        y = numpy.nan_to_num((bounds[:, 1] + bounds[:, 3]) / 2)
+        cell_x = _gridCell(x, side)
+        cell_y = _gridCell(y, side)
+        # Going back and forth across each row of cells, so that neighboring cells end up in the same shard
+        cell_x = numpy.where(cell_y % 2 == 1, side - 1 - cell_x, cell_x)
+        order = numpy.argsort(cell_y * side + cell_x, kind="stable")
+    else:
+        raise ValueError(f"Unknown shard_by {shard_by!r} - must be one of 'rows', 'grid', or 'hilbert'")
+    return [gdf.iloc[rows] for rows in numpy.array_split(order, shards) if len(rows)]
+
+# Purpose: find which of side equal-width cells each value falls into
+def _gridCell(values, side):
+    import numpy
+    low, high = values.min(), values.max()
+    width = (high - low) / side or 1
+    return numpy.clip(((values - low) / width).astype(int), 0, side - 1)
+
+# Purpose: encode a GeoDataFrame shard to a file (run in a worker process by postLayer)
+# Returns the path that was written to
+def _writeShard(gdf, format, chunk_size, path, inner_name):
+    with _encodedGeoDataFrame(gdf, format, chunk_size, inner_name) as encoded, open(path, "wb") as file_obj:
+        shutil.copyfileobj(encoded, file_obj)
+    return path
+
+# Purpose: wait for a shard to be encoded, then send it to a presigned upload URL (see _uploadFile)
+# encoding: the Future of the _writeShard call for the shard
+def _uploadShard(encoding, client, upload_url, presigned_attributes, file_name, stream, chunk_size, retries):
+    try:
+        path = encoding.result()
+    except Exception as e:
+        return FileUpload(file_name, 0, 0.0, None, repr(e))
+    return _uploadFile(client, upload_url, presigned_attributes, file_name, path, None, stream, chunk_size, retries)
+
+# Purpose: compute a fingerprint of the data being uploaded as a layer, without holding it all in memory
+# files: the list of paths and GeoDataFrames passed to postLayer
+# chunk_size: how many rows of a GeoDataFrame to serialize at once
+# Returns the hex digest of a sha256 hash
+# NOTE: files are hashed by their name and bytes; GeoDataFrames by their GeoJSON (see _iterGeoJSON), so the format they are sent in does not matter
+def _contentHash(files: list, chunk_size: int=50000):
+    digest = hashlib.sha256()
+    for f in files:
+        if _isGeoDataFrame(f):
+            digest.update(b"gdf\0")
+            for piece in _iterGeoJSON(f, chunk_size):
+                digest.update(piece)
+        else:
+            digest.update(b"file\0" + os.path.basename(f).encode() + b"\0")
+            with open(f, "rb") as file_obj:
+                for piece in iter(lambda: file_obj.read(1024*1024), b""):
+                    digest.update(piece)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+# Purpose: find the layer that was uploaded last time with the same data, if it is still on the map
+# client: the FeltClient to query with
+# manifest: the UploadManifest to look in
+# map_id: the ID of the map
+# name: the name of the layer
+# digest: the hash of the data about to be uploaded (see _contentHash)
+# Returns a Layer, or None if the data changed or the layer was deleted (or failed to process)
+def _unchangedLayer(client, manifest, map_id, name, digest):
+    entry = manifest.lookup(map_id, name)
+    if not entry or entry["hash"] != digest:
+        return None
+    # Checking (quietly) that the layer still exists
+    status, body, error = _batchRequest(client, "GET", f"maps/{map_id}/layers/{entry['layer_id']}")
+    if error or not body:
+        return None
+    layer = _layerFromJSON(body["data"], map_id)
+    return None if layer.status == "failed" else layer
+
 ### GET REQUESTS ###
 # All functions that require a GET request to perform
 
 # Purpose: return information about the current user
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # Returns a User class
 def getUserInfo(pat):
     # Setting the endpoint
@@ -129,15 +744,12 @@ def getUserInfo(pat):
     # Only proceeding if something was actually returned
     if user_info:
         # Creating the class to store the information
-        user = User(type = user_info["data"]["type"],
-                    id = user_info["data"]["id"],
-                    name = user_info["data"]["attributes"]["name"],
-                    email = user_info["data"]["attributes"]["email"])
+        user = _userFromJSON(user_info["data"])
         # Returning the User
         return user
 
 # Purpose: return information about a map
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
 # Returns a Map class
 def getMapInfo(pat, map_id):
@@ -148,21 +760,32 @@ def getMapInfo(pat, map_id):
     # Only proceeding if something was actually returned
     if map_info:
         # Creating the class to store the information
-        map = Map(type = map_info["data"]["type"],
-                  id = map_info["data"]["id"],
-                  title = map_info["data"]["attributes"]["title"],
-                  url = map_info["data"]["attributes"]["url"])
+        map = _mapFromJSON(map_info["data"])
         # Returning the Map
         return map
 
 # Purpose: retrieves the feature collection of all the elements in a map
 # NOTE: this does NOT mean the data that powers layers - this refers to drawings, text, notes, etc.
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
-# Returns a Geopandas GeoDataFrame of all the elements
-def getMapElements(pat, map_id):
+# fast: whether to decode the response in bulk (see _decodeFeatures), instead of with GeoDataFrame.from_features
+# as_arrow: whether to return a pyarrow Table (with geometries as WKB) instead of a GeoDataFrame - implies fast
+# stream: whether to parse the elements as they are downloaded, and return a generator of GeoJSON features instead
+# batch_size: when streaming, yields lists of up to this many features instead of one at a time
+# NOTE: streaming requires ijson, which can be installed with: pip install feltpy[stream]
+# Returns a Geopandas GeoDataFrame of all the elements (or a generator, if streaming)
+def getMapElements(pat, map_id, fast: bool=True, as_arrow: bool=False, stream: bool=False, batch_size: int=None):
     # Setting the endpoint
     endpoint = f"maps/{map_id}/elements"
+    # Handing back the features one at a time, as they arrive
+    if stream:
+        return _streamRequest(pat, endpoint, ("data.features.item", "data.item"), batch_size)
+    # Decoding the raw response in bulk
+    if fast or as_arrow:
+        content = _getRequest(pat, endpoint, raw=True)
+        if content:
+            return _decodeFeatures(content, as_arrow)
+        return None
     # Retrieving the response
     map_elements = _getRequest(pat, endpoint)
     # Only proceeding if something was actually returned
@@ -171,23 +794,58 @@ def getMapElements(pat, map_id):
         return gdf_elements
 
 # Purpose: retrieves all of the comments in a map
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
-# Returns a JSON of all the elements
-# TODO: Would be nice to return this as a structured format, maybe a dataframe?
-# TODO: Is possible to specify this as a JSON or a CSV
-def getMapComments(pat, map_id):
+# as_dataframe: whether to return the comments as a pandas DataFrame, with one row per comment (see _commentsToDataFrame)
+# stream: whether to parse the comments as they are downloaded, and return a generator of them instead
+# batch_size: when streaming, yields lists of up to this many comments instead of one at a time
+# NOTE: streaming requires ijson, which can be installed with: pip install feltpy[stream]
+# Returns a DataFrame of all the comments (or their JSON, if as_dataframe is False, or a generator, if streaming)
+# NOTE: to save the comments as a CSV, see exportMapComments
+def getMapComments(pat, map_id, as_dataframe: bool=True, stream: bool=False, batch_size: int=None):
     # Setting the endpoint
     endpoint = f"maps/{map_id}/comments/export"
+    # Handing back the comments one at a time, as they arrive
+    if stream:
+        return _streamRequest(pat, endpoint, ("data.item", "item"), batch_size)
     # Retrieving the response
     map_comments = _getRequest(pat, endpoint)
     # Only proceeding if something was actually returned
     if map_comments:
+        if as_dataframe:
+            return _commentsToDataFrame(map_comments)
         return map_comments
 
+# Purpose: saves all of the comments in a map as a CSV, without holding the whole file in memory
+# pat: the user's personal access token, or a FeltClient
+# map_id: the ID of the map
+# destination: either a string path to write the CSV to, or a binary file-like object to write it into
+# chunk_size: how many bytes to read from the connection and write at a time
+# Returns the number of bytes written, or None if the export failed
+def exportMapComments(pat, map_id, destination, chunk_size: int=64*1024):
+    # Setting the endpoint
+    endpoint = f"maps/{map_id}/comments/export?format=csv"
+    # Querying the endpoint, without downloading the body up front
+    with _getClient(pat)._request("GET", endpoint, stream=True) as response:
+        # Checking the response
+        if response.status_code in range(400,500):
+            _process_error(response.json())
+            return None
+        elif response.status_code != 200:
+            _print("Unexpected error occured:", response.status_code)
+            _print(response.text)
+            return None
+        # Copying the CSV across as it arrives
+        written = 0
+        with (open(destination, "wb") if isinstance(destination, (str, os.PathLike)) else contextlib.nullcontext(destination)) as file_obj:
+            for chunk in response.iter_content(chunk_size):
+                file_obj.write(chunk)
+                written += len(chunk)
+        return written
+
 # Purpose: retrieves all of the layers of a map
 # NOTE: Only retrieves metadata, not actual data
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
 # Returns a LayerCollection of all the elements
 def getLayers(pat, map_id):
@@ -204,7 +862,7 @@ def getLayers(pat, map_id):
 
 # Purpose: retrieves the information for a single layer
 # NOTE: Only retrieves metadata, not actual data
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
 # layer_id: the ID of the layer
 # Returns a Layer
@@ -216,19 +874,58 @@ def getLayer(pat, map_id, layer_id):
     # Only proceeding if something was actually returned
     if map_layer:
         # Creating the class to store the information
-        layer = Layer(type = map_layer["data"]["type"],
-                      id = map_layer["data"]["id"],
-                      name = map_layer["data"]["attributes"]["name"],
-                      status = map_layer["data"]["attributes"]["status"],
-                      map_id = map_id,
-                      datasets = map_layer["data"]["relationships"]["datasets"])
+        layer = _layerFromJSON(map_layer["data"], map_id)
         return layer
 
+# Layer statuses that mean Felt has finished processing a layer, one way or the other
+_finished_statuses = ("completed", "failed")
+
+# Purpose: waits until layers have finished processing, checking their status less and less often
+# pat: the user's personal access token, or a FeltClient
+# map_id: the ID of the map
+# layer_ids: a list of the IDs of the layers to wait for
+# timeout: the most seconds to wait in total
+# interval: seconds to wait before the first re-check, which doubles (with some randomness) after each check
+# max_interval: the most seconds to wait between checks
+# verbose: whether or not you want a message printed if the timeout is reached
+# NOTE: while several layers are still processing, all of them are checked with a single getLayers call
+# Returns a list of Layers, in the same order as layer_ids - any not yet finished when the timeout is reached keep their last status
+def waitForLayers(pat, map_id, layer_ids: list, timeout: float=600, interval: float=1.0, max_interval: float=30.0, verbose: bool=True):
+    layers = {layer_id: None for layer_id in layer_ids}
+    pending = list(layer_ids)
+    deadline = time.monotonic() + timeout
+    delay = interval
+    while pending:
+        # Checking on every pending layer at once, or just the one if only one is left
+        # NOTE: cached responses are skipped, as the statuses are expected to change
+        if len(pending) > 1:
+            map_layers = _getRequest(pat, f"maps/{map_id}/layers", use_cache=False)
+            lc = LayerCollection(map_id = map_id, layers = map_layers) if map_layers else None
+            found = [lc.getLayer(layer_id) for layer_id in pending] if lc is not None else []
+        else:
+            map_layer = _getRequest(pat, f"maps/{map_id}/layers/{pending[0]}", use_cache=False)
+            found = [_layerFromJSON(map_layer["data"], map_id)] if map_layer else []
+        for layer in found:
+            if layer:
+                layers[layer.id] = layer
+        pending = [i for i in pending if not (layers[i] and layers[i].status in _finished_statuses)]
+        remaining = deadline - time.monotonic()
+        if not pending:
+            break
+        if remaining <= 0:
+            if verbose:
+                _print("Timed out waiting for layers to finish processing:", ", ".join(pending))
+            break
+        # Waiting somewhere between half and all of the current delay, so that many waiters don't all check at once
+        time.sleep(min(delay * random.uniform(0.5, 1.0), remaining))
+        delay = min(delay * 2, max_interval)
+    return [layers[layer_id] for layer_id in layer_ids]
+
 ### POST REQUESTS ###
 # All functions that require a POST request to perform
 
 # Purpose: make a new blank map
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # title: Name of the map - if blank, will be "Untitled Map"
 # basemap: Basemap of map - can be "default", "satellite", tile URL, or hex color string (#FF0000)
 # layer_urls: list of URLs to load in map - only raster layer tile URLs supported as of 2023-07-28
@@ -253,83 +950,212 @@ def postMap(pat, title: str=None, basemap: str="default", layer_urls: list=[], l
     # Only proceeding if something was actually returned
     if map_info:
         # Creating the class to store the information
-        map = Map(type = map_info["data"]["type"],
-                  id = map_info["data"]["id"],
-                  title = map_info["data"]["attributes"]["title"],
-                  url = map_info["data"]["attributes"]["url"])
+        map = _mapFromJSON(map_info["data"])
         # Returning the Map
         return map
 
 # Purpose: to upload a layer to S3
 # NOTE: Will automatically call _processLayer to add it the map unless process is set to False
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
-# file: either a string path or a Geopandas GeoDataFrame to upload
+# file: either a path (a string or path-like object) or a Geopandas GeoDataFrame to upload, or a list of them to all be uploaded to the same layer
 # NOTE: All GeoDataFrames will be re-projected to CRS 4326!
 # name: what to name the layer
 # process: whether or not to call _processLayer, which finishes uploading the data to the Map (instead of just the cloud)
 # verbose: whether or not you want messages printed about the upload being successful or not
-# Doesn't return anything
-# TODO: Have this work with a list of files as well, that all get uploaded to the same layer
-# TODO: Implement verbose
-def postLayer(pat, map_id, file: str|geopandas.GeoDataFrame, name: str, process: bool=True, verbose: bool=True):
-    # If file is a string, check that it corresponds to a file
-    if type(file) == str:
-        if os.path.exists(file):
-            # Grabbing the name of the file, which is necessary for uploading
-            file_name = os.path.basename(file)
-        else:
-            print("File does not exist - check path and retry")
-            return None 
-    # If a file is a GeoDataFrame, create a dummy name for it
-    elif type(file) == geopandas.GeoDataFrame:
-        file_name = re.sub("[^\w]", "_", "gdf_"+name)
+# stream: whether to stream the upload from disk, rather than building it in memory
+# NOTE: when streaming, GeoDataFrames are re-projected and serialized chunk_size rows at a time, so memory use stays flat
+# chunk_size: how many rows of a GeoDataFrame to serialize at once when streaming
+# format: the format to encode GeoDataFrames in before uploading - one of "geojson", "zip" (zipped GeoJSON), "fgb" (FlatGeobuf), "parquet" (GeoParquet), or "auto" (whichever is smallest)
+# NOTE: formats other than "geojson" are always streamed, and format is ignored for string paths
+# workers: how many files to upload (and shards to encode) at the same time
+# shards: if set, splits each GeoDataFrame into this many files, which are encoded in separate processes and uploaded in parallel
+# NOTE: as shards are encoded in other processes, scripts using this on Windows or macOS need an if __name__ == "__main__": guard
+# shard_by: how rows are grouped into shards - "rows" (current order), "grid" (cells of a grid), or "hilbert" (along a Hilbert curve)
+# retries: how many more times to try sending a file (or shard) that fails, without re-sending the ones that succeeded
+# wait: whether to wait for Felt to finish processing the layer before returning (see waitForLayers)
+# wait_timeout: the most seconds to wait for processing
+# precision: if set, snaps the coordinates of GeoDataFrames to this many decimal places (e.g. 6 is about 10cm), keeping geometries valid
+# simplify: if set, simplifies the geometries of GeoDataFrames with this tolerance (in degrees), without making them invalid
+# NOTE: the vertices and GeoJSON size of each GeoDataFrame's geometries, before and after, are kept as GeometryReductions under Layer.reductions
+# manifest: an UploadManifest, or the path of one, recording a hash of what was last uploaded to each (map, layer name)
+# NOTE: if the data has not changed since the last upload, and that layer is still on the map, nothing is uploaded and that layer is returned instead
+# Returns a Layer (whose status is not known yet, unless wait is True), with a list of FileUploads under Layer.uploads detailing each file
+# NOTE: if any file fails to upload, the layer is not processed and None is returned
+def postLayer(pat, map_id, file: str|geopandas.GeoDataFrame|list, name: str, process: bool=True, verbose: bool=True, stream: bool=True, chunk_size: int=50000, format: str="geojson", workers: int=4, shards: int=None, shard_by: str="rows", retries: int=2, wait: bool=False, wait_timeout: float=600, precision: int=None, simplify: float=None, manifest: str|UploadManifest=None):
+    # Accepting either a single file or a list of them
+    files = list(file) if isinstance(file, (list, tuple)) else [file]
+    # Paths can be strings or path-like objects (such as pathlib.Path), and anything else is turned away before a layer is made
+    files = [os.fspath(f) if isinstance(f, os.PathLike) else f for f in files]
+    if not files:
+        _print("No files given to upload")
+        return None
+    unsupported = [f for f in files if not isinstance(f, str) and not _isGeoDataFrame(f)]
+    if unsupported:
+        _print(f"Cannot upload a {type(unsupported[0]).__name__} - pass file paths or GeoDataFrames")
+        return None
+    reduce_geometries = precision is not None or bool(simplify)
+    # If keeping a manifest, checking whether the same data was already uploaded to this layer
+    digest = None
+    if manifest is not None:
+        manifest = manifest if isinstance(manifest, UploadManifest) else UploadManifest(manifest)
+        missing = [f for f in files if type(f) == str and not os.path.exists(f)]
+        if missing:
+            _print("File does not exist - check path and retry:", missing[0])
+            return None
+        digest = _contentHash(files, chunk_size)
+        # Changing how geometries are reduced changes what is uploaded
+        if reduce_geometries:
+            digest = hashlib.sha256(f"{digest}/{precision}/{simplify}".encode()).hexdigest()
+        unchanged = _unchangedLayer(_getClient(pat), manifest, map_id, name, digest)
+        if unchanged:
+            if verbose:
+                _print(f"Layer {name} has not changed since it was last uploaded, skipping upload")
+            return unchanged
+    n_frames = sum(_isGeoDataFrame(f) for f in files)
+    # Working out the name (and, for GeoDataFrames, the format) that each file will be uploaded with
+    # Each part is (file name, path or GeoDataFrame, format, whether it is a shard)
+    parts = []
+    reductions = []
+    frame_number = 0
+    for f in files:
+        # If file is a string, check that it corresponds to a file
+        if type(f) == str:
+            if os.path.exists(f):
+                # Grabbing the name of the file, which is necessary for uploading
+                parts.append((os.path.basename(f), f, None, False))
+            else:
+                _print("File does not exist - check path and retry:", f)
+                return None 
+        # If a file is a GeoDataFrame, create a dummy name for it, with the extension of the format it will be sent in
+        # When several GeoDataFrames are uploaded together, each one is numbered
+        elif _isGeoDataFrame(f):
+            # Reducing the geometries first, so that the smallest format is picked for what is actually sent
+            if reduce_geometries:
+                f, reduction = _reduceGeometries(f, precision, simplify, chunk_size)
+                reductions.append(reduction)
+            f_format = _smallestFormat(f) if format == "auto" else format
+            if f_format not in _upload_formats:
+                _print(f"Unknown format {format} - must be one of {list(_upload_formats)} or auto")
+                return None
+            frame_number += 1
+            f_name = re.sub(r"[^\w]", "_", "gdf_"+name if n_frames == 1 else f"gdf_{name}_{frame_number}")
+            # Large frames can be split into shards, which are each sent as their own file
+            if shards and shards > 1:
+                for i, shard in enumerate(_shardGeoDataFrame(f, shards, shard_by)):
+                    parts.append((f"{f_name}_part{i+1:04d}" + _upload_formats[f_format], shard, f_format, True))
+            else:
+                parts.append((f_name + _upload_formats[f_format], f, f_format, False))
+    file_names = [p[0] for p in parts]
+    if len(set(file_names)) != len(file_names):
+        _print("Files must all have different names - rename and retry")
+        return None
     
     # Setting the endpoint
     endpoint = f"maps/{map_id}/layers"
     # Structuring the data for the response
     data = {
-        "file_names": [file_name],
+        "file_names": file_names,
         "name": name
     }
     # First, doing a POST request to receive information on which bucket to upload the data to
-    upload_request = _postRequest(pat, endpoint, data)
-    # Then, doing a separate POST request to upload the data
-    # This one isn't done with _postRequest since it doesn't go through the Felt API
+    upload_request = _postRequest(pat, endpoint, data, priority=PRIORITY_BULK)
+    if not upload_request:
+        return None
+    # Then, doing separate POST requests to upload the data, several files at a time
+    # These aren't done with _postRequest since they don't go through the Felt API
     presigned_attributes = upload_request["data"]["attributes"]["presigned_attributes"]
     upload_url = upload_request["data"]["attributes"]["url"]
     layer_id = upload_request["data"]["attributes"]["layer_id"]
-    # If the file is a string path, need to process as a file object
-    if type(file) == str:
-        with open(file, "rb") as file_obj:
-            upload_action = requests.post(upload_url, files={**presigned_attributes, "file": file_obj})
-    # If the file is a GeoDataFrame, need to get the JSON representation of it, and upload that
-    elif type(file) == geopandas.GeoDataFrame:
-        upload_action = requests.post(upload_url, files={**presigned_attributes, "file": file.to_crs(4326).to_json()})
+    client = _getClient(pat)
+    uploads = []
+    any_shards = any(p[3] for p in parts)
+    # Shards are encoded in worker processes, into a temporary folder, and each one is uploaded as soon as it is written
+    tmp_dir = tempfile.mkdtemp(prefix="feltpy_") if any_shards else None
+    if any_shards:
+        from concurrent.futures import ProcessPoolExecutor
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(parts)))) as executor, \
+             (ProcessPoolExecutor(max_workers=max(1, workers)) if any_shards else contextlib.nullcontext()) as processes:
+            futures = []
+            for f_name, f, f_format, is_shard in parts:
+                if is_shard:
+                    encoding = processes.submit(_writeShard, f, f_format, chunk_size, os.path.join(tmp_dir, f_name), os.path.splitext(f_name)[0]+".geojson")
+                    futures.append(executor.submit(_uploadShard, encoding, client, upload_url, presigned_attributes, f_name, stream, chunk_size, retries))
+                else:
+                    futures.append(executor.submit(_uploadFile, client, upload_url, presigned_attributes, f_name, f, f_format, stream, chunk_size, retries))
+            for future in as_completed(futures):
+                # Files that had not started when another one failed were cancelled, and have nothing to report
+                if future.cancelled():
+                    continue
+                upload = future.result()
+                uploads.append(upload)
+                # If any file fails (after its retries), the rest are not started, and the layer is not processed
+                if upload.error:
+                    for other in futures:
+                        other.cancel()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    # Keeping the uploads in the same order as the files that were passed in
+    uploads.sort(key=lambda u: file_names.index(u.file_name))
     
     # Checking that the upload was successful
-    if upload_action.status_code != 204:
-        print("Layer upload not successful! Check the following message and try again")
-        print(upload_action.text)
-    else:
-        if process == True:
-            endpoint_upload = f"maps/{map_id}/layers/{layer_id}/finish_upload"
-            data_upload = {"filename": file_name}
-            upload_response = _postRequest(pat, endpoint_upload, data_upload)
-            # upload_response is a dictionary - if successfull, the "data" key is set to None
-            if not upload_response["data"]:
-                print("Processing started, check back later to see if it is complete")
-            else:
-                print("Processing failed")
-                print(upload_response)
+    failed = [u for u in uploads if u.error]
+    if failed or len(uploads) != len(parts):
+        _print("Layer upload not successful! Check the following message and try again")
+        for u in failed:
+            _print(u.file_name, u.error)
+        return None
+    if verbose:
+        for r in reductions:
+            _print(r)
+        for u in uploads:
+            _print(f"Uploaded {u.file_name}: {u.bytes} bytes in {u.seconds:.2f}s")
+    if process == True:
+        endpoint_upload = f"maps/{map_id}/layers/{layer_id}/finish_upload"
+        # All of the files belong to the same layer, so processing is only started once
+        data_upload = {"filename": file_names[0]}
+        upload_response = _postRequest(pat, endpoint_upload, data_upload, priority=PRIORITY_BULK)
+        # upload_response is a dictionary - if successfull, the "data" key is set to None
+        if upload_response is None:
+            return None
+        elif not upload_response["data"]:
+            if verbose:
+                _print("Processing started, check back later to see if it is complete")
+        else:
+            _print("Processing failed")
+            _print(upload_response)
+            return None
+    # Recording what was uploaded, so that the same data is not uploaded again
+    if digest is not None and process:
+        manifest.record(map_id, name, digest, layer_id)
+    # Waiting for processing to finish, if asked to and processing was started
+    if wait and process:
+        layer = waitForLayers(pat, map_id, [layer_id], timeout=wait_timeout, verbose=verbose)[0]
+        if layer:
+            layer.uploads = uploads
+            layer.reductions = reductions or None
+            return layer
+    # Otherwise, returning the (still processing) layer, along with how each file was uploaded
+    return Layer(type = "layer",
+                 id = layer_id,
+                 name = name,
+                 status = None,
+                 map_id = map_id,
+                 datasets = None,
+                 uploads = uploads,
+                 reductions = reductions or None)
 
 # Purpose: to upload a layer hosted elsewhere on the internet
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
 # url: the URL that points to the content to upload
 # name: what to name the layer
+# wait: whether to wait for Felt to finish processing the layer before returning (see waitForLayers)
+# wait_timeout: the most seconds to wait for processing
 # Returns a Layer
-def postWebLayer(pat, map_id, url: str, name: str="Untitled Layer"):
+def postWebLayer(pat, map_id, url: str, name: str="Untitled Layer", wait: bool=False, wait_timeout: float=600):
     # Setting the endpoint
     endpoint = f"maps/{map_id}/layers/url_import"
     # Setting up the parameter dictionary 
@@ -343,13 +1169,15 @@ def postWebLayer(pat, map_id, url: str, name: str="Untitled Layer"):
                             status = None, 
                             map_id = map_id, 
                             datasets = None)
+        if wait:
+            uploaded_layer = waitForLayers(pat, map_id, [uploaded_layer.id], timeout=wait_timeout)[0] or uploaded_layer
         return uploaded_layer
 
 ### PATCH REQUESTS ###
 # All functions that require a PATCH request to perform
 
 # Purpose: Updates the details of a layer
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
 # layer_id: the ID of the layer
 # name: the name you want to update the layer
@@ -360,48 +1188,720 @@ def patchLayer(pat, map_id, layer_id, name: str=None, description: str=None, vis
     # Setting the endpoint
     endpoint = f"maps/{map_id}/layers/{layer_id}"
     # Setting up the parameter dictionary 
-    data = {}
-    for k,v in zip(["name","description","visible"], [name, description, visible]):
-        if v:
-            data[k] = v
+    data = _layerPatchData(name, description, visible)
     # Retrieving the response (note: no actual response)
     patch_layer = _patchRequest(pat, endpoint, data)
     # Only proceeding if something was actually returned
     if patch_layer:
         # Creating the class to store the information
-        layer = Layer(type = patch_layer["data"]["type"],
-                      id = patch_layer["data"]["id"],
-                      name = patch_layer["data"]["attributes"]["name"],
-                      status = patch_layer["data"]["attributes"]["status"],
-                      map_id = map_id,
-                      datasets = patch_layer["data"]["relationships"]["datasets"])
+        layer = _layerFromJSON(patch_layer["data"], map_id)
         return layer
 
 ### DELETE REQUESTS ###
 # All functions that require a DELETE request to perform
 
 # Purpose: Deletes a map
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
-# Does not return anyting
-# TODO: Write code to confirm the map is deleted by re-querying for the map using the ID
+# Returns True if the map was deleted
+# NOTE: to confirm that maps were deleted by re-querying for them, see deleteMaps
 def deleteMap(pat, map_id):
     # Setting the endpoint
     endpoint = f"maps/{map_id}"
     # Retrieving the response (note: no actual response)
     delete_request = _deleteRequest(pat, endpoint)
+    return delete_request
 
 # Purpose: Deletes a layer within a map
-# pat: the user's personal access token
+# pat: the user's personal access token, or a FeltClient
 # map_id: the ID of the map
 # layer_id: the ID of the layer
-# Does not return anyting
-# TODO: Write code to confirm the layer is deleted by re-querying for the layer using the ID
+# Returns True if the layer was deleted
+# NOTE: to confirm that layers were deleted by re-querying for them, see deleteLayers
 def deleteLayer(pat, map_id, layer_id):
     # Setting the endpoint
     endpoint = f"maps/{map_id}/layers/{layer_id}"
     # Retrieving the response (note: no actual response)
     delete_request = _deleteRequest(pat, endpoint)
+    return delete_request
+
+### BATCH REQUESTS ###
+# Functions that perform many PATCH or DELETE requests at once, on a pool of threads
+
+# Purpose: run a function over many items on a pool of threads, timing each one
+# func: the function to run, which returns a BatchResult for an item
+# items: the items to run it over
+# workers: how many to run at the same time
+# Returns a list of BatchResults, in the same order as items
+def _runBatch(func, items, workers):
+    def timed(item):
+        start = time.perf_counter()
+        result = func(item)
+        result.seconds = time.perf_counter() - start
+        return result
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items) or 1))) as executor:
+        return list(executor.map(timed, items))
+
+# Purpose: Updates the details of many layers at once
+# pat: the user's personal access token, or a FeltClient
+# updates: a list of dicts, each with a map_id and layer_id, and any of name, description, and visible (see patchLayer)
+# workers: how many updates to send at the same time
+# Returns a list of BatchResults, in the same order as updates, with the updated Layer under value
+def patchLayers(pat, updates: list, workers: int=8):
+    client = _getClient(pat)
+    def patch(update):
+        endpoint = f"maps/{update['map_id']}/layers/{update['layer_id']}"
+        data = _layerPatchData(update.get("name"), update.get("description"), update.get("visible"))
+        status, body, error = _batchRequest(client, "PATCH", endpoint, data)
+        value = _layerFromJSON(body["data"], update["map_id"]) if body and not error else None
+        return BatchResult(update, status, error, value)
+    return _runBatch(patch, list(updates), workers)
+
+# Purpose: Deletes many layers at once
+# pat: the user's personal access token, or a FeltClient
+# layers: a list of Layers, or of (map_id, layer_id) tuples
+# workers: how many deletions to send at the same time
+# confirm: whether to check that the layers are gone afterwards, using one getLayers call per map
+# Returns a list of BatchResults, in the same order as layers (with confirmed set, if confirm is True)
+def deleteLayers(pat, layers: list, workers: int=8, confirm: bool=False):
+    client = _getClient(pat)
+    items = [(l.map_id, l.id) if isinstance(l, Layer) else tuple(l) for l in layers]
+    def delete(item):
+        status, body, error = _batchRequest(client, "DELETE", f"maps/{item[0]}/layers/{item[1]}")
+        return BatchResult(item, status, error)
+    results = _runBatch(delete, items, workers)
+    if confirm:
+        # Re-querying each map's layers once, rather than each layer on its own
+        map_ids = list(dict.fromkeys(item[0] for item in items))
+        def remaining(map_id):
+            status, body, error = _batchRequest(client, "GET", f"maps/{map_id}/layers")
+            return BatchResult(map_id, status, error, {l["id"] for l in body["data"]} if body and not error else None)
+        still_there = {r.item: r.value for r in _runBatch(remaining, map_ids, workers)}
+        for r in results:
+            layer_ids = still_there[r.item[0]]
+            r.confirmed = None if layer_ids is None else r.item[1] not in layer_ids
+    return results
+
+# Purpose: Deletes many maps at once
+# pat: the user's personal access token, or a FeltClient
+# map_ids: a list of the IDs of the maps (or of Maps)
+# workers: how many deletions to send at the same time
+# confirm: whether to check that the maps are gone afterwards, by re-querying for each one
+# Returns a list of BatchResults, in the same order as map_ids (with confirmed set, if confirm is True)
+def deleteMaps(pat, map_ids: list, workers: int=8, confirm: bool=False):
+    client = _getClient(pat)
+    items = [m.id if isinstance(m, Map) else m for m in map_ids]
+    def delete(map_id):
+        status, body, error = _batchRequest(client, "DELETE", f"maps/{map_id}")
+        result = BatchResult(map_id, status, error)
+        # A deleted map should no longer be found
+        if confirm and not error:
+            check_status, check_body, check_error = _batchRequest(client, "GET", f"maps/{map_id}")
+            result.confirmed = check_status == 404 if check_status else None
+        return result
+    return _runBatch(delete, items, workers)
+
+### CLIENT ###
+# A reusable connection to the Felt API
+
+# Class type for FeltClients, which hold a personal access token and a pooled requests.Session
+# Reusing the session means that repeated calls share open connections, rather than each doing a new TCP+TLS handshake
+# pat: the user's personal access token
+# pool_size: how many connections to keep open for reuse (should be at least the number of threads sharing the client)
+# keep_alive: whether or not connections are kept open between requests
+# timeout: seconds to wait on the server, either a single number or a (connect, read) tuple
+# cache: whether to cache the responses of getUserInfo, getMapInfo, getLayers, and getLayer - either True, or a ResponseCache
+# retries: how many times to retry a request that was rate limited (429), or an idempotent one that failed with a 5xx or connection error
+# rate_limiter: the RateLimiter to send requests through - by default, the one shared by everything using this pat (see setRateLimit)
+# hooks: a list of callables passed a RequestEvent after each of this client's requests and uploads, on top of those registered with addHook
+# api_url: the base URL of the API to send requests to - by default, Felt's (see feltpy.mockserver for a local stand-in)
+# Every function in this package accepts a FeltClient in place of the pat, and is also available as a method here
+# Can be used as a context manager, which closes the connections on exit
+class FeltClient:
+    # Info is created on initialization
+    def __init__(self, pat, pool_size: int=10, keep_alive: bool=True, timeout=(10, 60), cache=False, retries: int=3, rate_limiter=None, hooks: list=None, api_url: str=None):
+        self.pat = pat
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.cache = ResponseCache() if cache is True else (None if cache is False else cache)
+        self.retries = retries
+        self.rate_limiter = rate_limiter or _rateLimiterFor(pat)
+        self.hooks = list(hooks or [])
+        self.api_url = api_url.rstrip("/") + "/{endpoint}" if api_url else _felt_api
+        # Headers are only built once, instead of on every request
+        self._headers = _requestHeaders(pat)
+        if not keep_alive:
+            self._headers["Connection"] = "close"
+        # Setting up the session, with a connection pool sized for the expected number of threads
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+    # Sends a request to the Felt API, returning the raw response
+    # Requests wait their turn with the rate limiter, and are retried (see retries) after a 429, 5xx, or dropped connection
+    # Anything that changes a map or layer also removes its cached responses
+    # stream: whether to leave the body to be read from the connection as it arrives, instead of downloading it all first
+    # priority: how soon the request should be sent when rate limited - by default, reads are PRIORITY_INTERACTIVE and writes PRIORITY_NORMAL
+    # Once the request is done, a RequestEvent is passed to each hook (see addHook)
+    def _request(self, method, endpoint, data=None, headers=None, stream: bool=False, priority: int=None):
+        headers = {**self._headers, **headers} if headers else self._headers
+        if priority is None:
+            priority = PRIORITY_INTERACTIVE if method == "GET" else PRIORITY_NORMAL
+        idempotent = method in _idempotent_methods
+        hooks = self.hooks + _hooks if self.hooks or _hooks else None
+        start = time.perf_counter()
+        waited = 0.0
+        for attempt in range(self.retries + 1):
+            retry = attempt < self.retries
+            wait_start = time.perf_counter()
+            self.rate_limiter.acquire(priority)
+            waited += time.perf_counter() - wait_start
+            try:
+                response = self._session.request(method, self.api_url.format(endpoint=endpoint), headers=headers, json=data, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not (idempotent and retry):
+                    if hooks:
+                        _emit(hooks, RequestEvent("request", method, _endpointTemplate(endpoint), None, time.perf_counter()-start, waited, None, None, attempt, repr(e)))
+                    raise
+                time.sleep(_backoff(attempt))
+                continue
+            # A 429 means the request was not carried out, so any method can be retried - everyone sharing the pat also holds off
+            if response.status_code == 429:
+                self.rate_limiter.block(_retryAfter(response) or _backoff(attempt))
+                if retry:
+                    response.close()
+                    continue
+            elif response.status_code >= 500 and idempotent and retry:
+                response.close()
+                time.sleep(_backoff(attempt))
+                continue
+            break
+        if method != "GET" and self.cache is not None:
+            self.cache.invalidate(endpoint)
+        if hooks:
+            _emit(hooks, RequestEvent("request", method, _endpointTemplate(endpoint), response.status_code, time.perf_counter()-start, waited,
+                                      _bodySize(response.request.body), _responseSize(response, stream), attempt))
+        return response
+    # Sends a file to a presigned upload URL, either as requests' files= or as a _MultipartStream, returning the raw response
+    # NOTE: the Felt headers are not sent here, as the URL does not point to the Felt API
+    def _upload(self, url, files=None, stream=None):
+        headers = {} if self.keep_alive else {"Connection": "close"}
+        if stream is not None:
+            headers["Content-Type"] = stream.content_type
+        hooks = self.hooks + _hooks if self.hooks or _hooks else None
+        if not hooks:
+            return self._session.post(url, files=files, data=stream, headers=headers, timeout=self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self._session.post(url, files=files, data=stream, headers=headers, timeout=self.timeout)
+        except Exception as e:
+            _emit(hooks, RequestEvent("upload", "POST", "upload", None, time.perf_counter()-start, 0.0, _bodySize(stream), None, 0, repr(e)))
+            raise
+        _emit(hooks, RequestEvent("upload", "POST", "upload", response.status_code, time.perf_counter()-start, 0.0,
+                                  _bodySize(stream if stream is not None else response.request.body), _responseSize(response, False), 0))
+        return response
+    # Closes all pooled connections
+    def close(self):
+        self._session.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+    # Methods to call all of the package's functions with this client
+    def getUserInfo(self):
+        return getUserInfo(self)
+    def getMapInfo(self, map_id):
+        return getMapInfo(self, map_id)
+    def getMapElements(self, map_id, fast: bool=True, as_arrow: bool=False, stream: bool=False, batch_size: int=None):
+        return getMapElements(self, map_id, fast, as_arrow, stream, batch_size)
+    def getMapComments(self, map_id, as_dataframe: bool=True, stream: bool=False, batch_size: int=None):
+        return getMapComments(self, map_id, as_dataframe, stream, batch_size)
+    def exportMapComments(self, map_id, destination, chunk_size: int=64*1024):
+        return exportMapComments(self, map_id, destination, chunk_size)
+    def getLayers(self, map_id):
+        return getLayers(self, map_id)
+    def getLayer(self, map_id, layer_id):
+        return getLayer(self, map_id, layer_id)
+    def waitForLayers(self, map_id, layer_ids: list, timeout: float=600, interval: float=1.0, max_interval: float=30.0, verbose: bool=True):
+        return waitForLayers(self, map_id, layer_ids, timeout, interval, max_interval, verbose)
+    def postMap(self, title: str=None, basemap: str="default", layer_urls: list=[], lat: float=0.0, lon: float=0.0, zoom: float=10.0):
+        return postMap(self, title, basemap, layer_urls, lat, lon, zoom)
+    def postLayer(self, map_id, file, name: str, process: bool=True, verbose: bool=True, stream: bool=True, chunk_size: int=50000, format: str="geojson", workers: int=4, shards: int=None, shard_by: str="rows", retries: int=2, wait: bool=False, wait_timeout: float=600, precision: int=None, simplify: float=None, manifest=None):
+        return postLayer(self, map_id, file, name, process, verbose, stream, chunk_size, format, workers, shards, shard_by, retries, wait, wait_timeout, precision, simplify, manifest)
+    def postWebLayer(self, map_id, url: str, name: str="Untitled Layer", wait: bool=False, wait_timeout: float=600):
+        return postWebLayer(self, map_id, url, name, wait, wait_timeout)
+    def patchLayer(self, map_id, layer_id, name: str=None, description: str=None, visible: bool=None):
+        return patchLayer(self, map_id, layer_id, name, description, visible)
+    def deleteMap(self, map_id):
+        return deleteMap(self, map_id)
+    def deleteLayer(self, map_id, layer_id):
+        return deleteLayer(self, map_id, layer_id)
+    def patchLayers(self, updates: list, workers: int=8):
+        return patchLayers(self, updates, workers)
+    def deleteLayers(self, layers: list, workers: int=8, confirm: bool=False):
+        return deleteLayers(self, layers, workers, confirm)
+    def deleteMaps(self, map_ids: list, workers: int=8, confirm: bool=False):
+        return deleteMaps(self, map_ids, workers, confirm)
+
+# Class type for ResponseCaches, an in-memory cache of Felt API responses that a FeltClient can use
+# Responses are kept for a set number of seconds depending on the endpoint, and the least recently used are dropped once full
+# Once a response expires, if Felt sent an ETag with it, it is re-checked with a conditional request rather than re-downloaded
+# ttls: dict of seconds to keep each kind of response for, by "user", "map", "layers", or "layer" (any not given use the defaults)
+# max_entries: the most responses to keep at once
+# Has attributes for hits, misses, revalidations (expired responses that were still correct), and evictions,
+# and a stats() method that breaks these down by kind of response
+class ResponseCache:
+    # Default seconds to keep each kind of response for
+    default_ttls = {"user": 300, "map": 60, "layers": 15, "layer": 15}
+    # Info is created on initialization
+    def __init__(self, ttls: dict=None, max_entries: int=1024):
+        self.ttls = {**self.default_ttls, **(ttls or {})}
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._stats = {kind: {"hits": 0, "misses": 0, "revalidations": 0} for kind in self.ttls}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    # Finds which kind of response an endpoint returns, or None if it should not be cached
+    @staticmethod
+    def _kind(endpoint):
+        parts = endpoint.strip("/").split("/")
+        if parts == ["user"]:
+            return "user"
+        elif len(parts) == 2 and parts[0] == "maps":
+            return "map"
+        elif len(parts) == 3 and parts[0] == "maps" and parts[2] == "layers":
+            return "layers"
+        elif len(parts) == 4 and parts[0] == "maps" and parts[2] == "layers":
+            return "layer"
+    # Returns the cached entry for an endpoint (fresh or not), counting a hit if it is still fresh
+    def lookup(self, endpoint):
+        kind = self._kind(endpoint)
+        if kind is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is not None and entry.fresh():
+                self._entries.move_to_end(endpoint)
+                self.hits += 1
+                self._stats[kind]["hits"] += 1
+            else:
+                self.misses += 1
+                self._stats[kind]["misses"] += 1
+            return entry
+    # Saves a response, dropping the least recently used ones if the cache is full
+    def store(self, endpoint, value, etag=None):
+        kind = self._kind(endpoint)
+        if kind is None:
+            return
+        with self._lock:
+            self._entries[endpoint] = _CacheEntry(value, etag, time.monotonic() + self.ttls[kind])
+            self._entries.move_to_end(endpoint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    # Marks an expired response as correct again (after a 304), for another full TTL
+    def revalidated(self, endpoint):
+        kind = self._kind(endpoint)
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is not None:
+                entry.expires = time.monotonic() + self.ttls[kind]
+                self._entries.move_to_end(endpoint)
+            self.revalidations += 1
+            self._stats[kind]["revalidations"] += 1
+    # Removes the responses that a request to an endpoint could have changed
+    # Changes to a layer affect the layer and its map's layer list, while changes to a map itself affect everything under it
+    def invalidate(self, endpoint):
+        parts = endpoint.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "maps":
+            return
+        map_key = f"maps/{parts[1]}"
+        if len(parts) == 2:
+            stale = lambda k: k.strip("/") == map_key or k.startswith(map_key + "/")
+        else:
+            affected = {f"{map_key}/layers"}
+            if len(parts) >= 4 and parts[2] == "layers":
+                affected.add(f"{map_key}/layers/{parts[3]}")
+            stale = lambda k: k.strip("/") in affected
+        with self._lock:
+            for k in [k for k in self._entries if stale(k)]:
+                del self._entries[k]
+    # Empties the cache
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    # Returns a dict of hits, misses, and revalidations for each kind of response
+    def stats(self):
+        with self._lock:
+            return {kind: dict(counts) for kind, counts in self._stats.items()}
+    def __len__(self):
+        return len(self._entries)
+
+# Class type for a single cached response, with its ETag and when it expires
+class _CacheEntry:
+    __slots__ = ("value", "etag", "expires")
+    def __init__(self, value, etag, expires):
+        self.value = value
+        self.etag = etag
+        self.expires = expires
+    def fresh(self):
+        return time.monotonic() < self.expires
+
+# Priorities for requests waiting on a RateLimiter - lower numbers are sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+# HTTP methods that can safely be sent again if there is no answer
+_idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Purpose: work out how long to wait before retrying a request
+# attempt: how many times the request has already been retried
+# Returns a number of seconds, which doubles with each attempt (up to 30), with some randomness so that retries spread out
+def _backoff(attempt: int):
+    return min(0.5 * 2 ** attempt, 30) * random.uniform(0.5, 1.0)
+
+# Purpose: read how long Felt asked to wait before sending more requests
+# response: a 429 response
+# Returns a number of seconds, or None if there was no (readable) Retry-After header
+def _retryAfter(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Class type for RateLimiters, which schedule the requests sent with a pat so that they stay under Felt's rate limits
+# Uses a token bucket: requests take a token each, and tokens refill at a steady rate, up to a maximum burst
+# After a 429, every request waits out the Retry-After time, and while waiting, higher-priority requests are sent first
+# rate: how many requests can be sent per second on average - if None, requests are only held back after a 429
+# burst: how many requests can be sent at once after a quiet period (defaults to rate, or 1)
+# state_file: if set, a file used to share the bucket with other processes on the same machine (requires fcntl, so not on Windows)
+class RateLimiter:
+    # Info is created on initialization
+    def __init__(self, rate: float=None, burst: float=None, state_file: str=None):
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._tickets = itertools.count()
+        self.configure(rate, burst, state_file)
+    # Changes the rate, burst, or state file of the limiter
+    def configure(self, rate: float=None, burst: float=None, state_file: str=None):
+        with self._cond:
+            self.rate = rate
+            self.burst = burst or max(1.0, rate or 1.0)
+            self.state_file = state_file
+            self._tokens = self.burst
+            self._updated = time.time()
+            self._blocked_until = 0.0
+            self._cond.notify_all()
+    # Waits until a request with the given priority is allowed to be sent
+    def acquire(self, priority: int=PRIORITY_NORMAL):
+        with self._cond:
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            self._cond.notify_all()
+            try:
+                while True:
+                    # Only the highest-priority (then oldest) waiting request can take a token
+                    if self._waiting[0] == ticket:
+                        wait = self._take()
+                        if wait <= 0:
+                            return
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+    # Takes a token without waiting, returning 0 if one was taken, or else how many seconds until one might be available
+    # NOTE: used by feltpy.aio, which waits on the event loop instead - these requests do not take part in the priority order
+    def _tryAcquire(self):
+        with self._cond:
+            return self._take()
+    # Asks every request to wait for the given number of seconds (e.g. after a 429)
+    def block(self, seconds: float):
+        with self._cond:
+            until = time.time() + seconds
+            if self.state_file:
+                with _lockedState(self.state_file, strict=False) as state:
+                    state["blocked_until"] = max(state.get("blocked_until", 0.0), until)
+            self._blocked_until = max(self._blocked_until, until)
+            self._cond.notify_all()
+    # Tries to take a token, returning 0 if one was taken, or else how many seconds until one might be available
+    def _take(self):
+        if self.state_file:
+            # The state only holds timings, so if it is ever unreadable it is safe to start over
+            with _lockedState(self.state_file, strict=False) as state:
+                state.setdefault("tokens", self.burst)
+                state.setdefault("updated", time.time())
+                state.setdefault("blocked_until", 0.0)
+                wait, state["tokens"], state["updated"] = self._refill(state["tokens"], state["updated"], max(state["blocked_until"], self._blocked_until))
+                return wait
+        wait, self._tokens, self._updated = self._refill(self._tokens, self._updated, self._blocked_until)
+        return wait
+    # Refills the bucket for the time that has passed, and takes a token if there is one
+    # Returns the seconds to wait (0 if a token was taken), and the new number of tokens and time they were counted at
+    def _refill(self, tokens, updated, blocked_until):
+        now = time.time()
+        if now < blocked_until:
+            return blocked_until - now, tokens, updated
+        if self.rate is None:
+            return 0, tokens, now
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return 0, tokens - 1, now
+        return (1 - tokens) / self.rate, tokens, now
+
+# Purpose: read a JSON state file (of a RateLimiter or an UploadManifest)
+# path: the path of the state file
+# strict: whether to raise a ValueError if the file is not valid JSON - otherwise, its state starts over
+# Returns a dict of the state, which is empty if the file does not exist
+def _readState(path, strict: bool=True):
+    try:
+        with open(path) as file_obj:
+            text = file_obj.read()
+    except FileNotFoundError:
+        return {}
+    try:
+        return json.loads(text or "{}")
+    except ValueError:
+        if strict:
+            raise ValueError(f"{path} is not valid JSON - fix or delete it and retry") from None
+        return {}
+
+# Purpose: open a JSON state file (of a RateLimiter or an UploadManifest) to change it, locked so that only one process changes it at a time
+# path: the path of the state file
+# strict: whether to raise a ValueError if the file is not valid JSON - otherwise, its state starts over
+# Yields a dict of the state, which is written back to the file on exit (unless an error was raised)
+# NOTE: the lock is held on a separate .lock file, and the state is written to a temporary file that then replaces the old one,
+# so that a crash part way through writing never leaves a half-written file, and reading (see _readState) needs no lock
+@contextlib.contextmanager
+def _lockedState(path, strict: bool=True):
+    import fcntl
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = _readState(path, strict)
+            yield state
+            directory, base = os.path.split(os.path.abspath(path))
+            file_obj = tempfile.NamedTemporaryFile("w", dir=directory, prefix=base + ".", suffix=".tmp", delete=False)
+            try:
+                with file_obj:
+                    file_obj.write(json.dumps(state))
+                os.replace(file_obj.name, path)
+            except BaseException:
+                os.remove(file_obj.name)
+                raise
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+# RateLimiters, one per personal access token, shared by every FeltClient (and thread) using that pat
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+# Purpose: find the RateLimiter shared by everything using a pat
+# pat: the user's personal access token
+# Returns the RateLimiter, creating one (that only holds back after a 429) the first time
+def _rateLimiterFor(pat):
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(pat)
+        if limiter is None:
+            limiter = RateLimiter()
+            _rate_limiters[pat] = limiter
+    return limiter
+
+# Purpose: set how quickly requests can be sent with a pat, across all threads (and optionally processes) using it
+# pat: the user's personal access token, or a FeltClient
+# rate: how many requests can be sent per second on average - if None, requests are only held back after a 429
+# burst: how many requests can be sent at once after a quiet period
+# state_file: if set, a file used to share the limit with other processes on the same machine
+# Does not return anything
+def setRateLimit(pat, rate: float=None, burst: float=None, state_file: str=None):
+    limiter = pat.rate_limiter if isinstance(pat, FeltClient) else _rateLimiterFor(pat)
+    limiter.configure(rate, burst, state_file)
+
+# Purpose: set the FeltClient that the free functions use for its pat
+# Useful for changing the pool size, keep-alive, or timeouts used by calls like getLayers(pat, map_id)
+# client: the FeltClient to use
+# Does not return anything
+def setDefaultClient(client: FeltClient):
+    with _default_clients_lock:
+        _default_clients[client.pat] = client
+
+### HOOKS ###
+# Ways to measure every request and upload, instead of relying on printed messages
+
+# Hooks that are passed a RequestEvent for every request and upload, by every client (see addHook)
+_hooks = []
+
+# Purpose: register a function to be called with a RequestEvent after every request to the Felt API and every file upload
+# hook: any callable that takes a RequestEvent, such as a MetricsCollector or a LoggingHook
+# Returns the hook, so that it can be kept to remove later
+# NOTE: hooks are called on the thread that sent the request, so they should be quick; to only measure one client, pass hooks to FeltClient instead
+def addHook(hook):
+    _hooks.append(hook)
+    return hook
+
+# Purpose: stop calling a hook that was registered with addHook
+# hook: the hook to remove
+def removeHook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+# Purpose: turn off (or back on) every message printed by the package, such as errors and upload progress
+# quiet: whether to stop printing
+# NOTE: hooks (see addHook) still see every request, so errors can be logged with a LoggingHook instead
+def setQuiet(quiet: bool=True):
+    global _quiet
+    _quiet = quiet
+
+# Purpose: pass an event to each hook, without letting a broken hook stop the request
+# hooks: the list of hooks
+# event: the RequestEvent
+def _emit(hooks, event):
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception as e:
+            _print("Hook failed:", repr(e))
+
+# The parts of an endpoint followed by an ID, and what the ID is replaced with in its template
+_endpoint_ids = {"maps": "{map_id}", "layers": "{layer_id}"}
+# The parts of an endpoint that follow maps/ or layers/ but are actions, rather than IDs
+_endpoint_actions = {"url_import"}
+
+# Purpose: turn an endpoint into a template, so that requests to the same endpoint for different maps and layers are grouped together
+# endpoint: the endpoint, such as "maps/abc/layers/def/finish_upload"
+# Returns the template, such as "maps/{map_id}/layers/{layer_id}/finish_upload"
+def _endpointTemplate(endpoint):
+    parts = endpoint.strip("/").split("/")
+    for i in range(1, len(parts)):
+        if parts[i-1] in _endpoint_ids and parts[i] not in _endpoint_actions:
+            parts[i] = _endpoint_ids[parts[i-1]]
+    return "/".join(parts)
+
+# Purpose: find how many bytes are in the body of a request
+# body: the body, as bytes, a string, a _MultipartStream, or None
+# Returns the number of bytes, or None if it can't be known without reading the body
+def _bodySize(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode())
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+# Purpose: find how many bytes are in the body of a response
+# response: the requests.Response
+# stream: whether the body is being left to be read later, in which case only its Content-Length is used
+# Returns the number of bytes, or None if it can't be known without reading the body
+def _responseSize(response, stream: bool):
+    if not stream:
+        return len(response.content)
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+# The upper bounds (in seconds) of the latency histogram buckets kept by a MetricsCollector
+_latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Class type for the statistics a MetricsCollector keeps for each endpoint
+class _EndpointStats:
+    __slots__ = ("count", "errors", "retries", "seconds", "max_seconds", "request_bytes", "response_bytes", "buckets", "statuses")
+    # Info is created on initialization
+    def __init__(self, n_buckets):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.buckets = [0] * (n_buckets + 1)
+        self.statuses = {}
+
+# Class type for MetricsCollectors, a hook that keeps counts, error rates, bytes, and a latency histogram for each endpoint, in memory
+# buckets: the upper bounds (in seconds) of the latency histogram's buckets - by default, from 5ms to 60s
+# Should be registered with addHook (or passed in FeltClient's hooks), then read with summary() or to_dataframe()
+# NOTE: percentiles are estimated from the histogram, so are rounded up to the bound of the bucket they fall in
+class MetricsCollector:
+    # Info is created on initialization
+    def __init__(self, buckets: tuple=None):
+        self.buckets = tuple(sorted(buckets or _latency_buckets))
+        self._stats = {}
+        self._lock = threading.Lock()
+    # Records an event
+    def __call__(self, event):
+        key = (event.kind, event.method, event.endpoint)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats(len(self.buckets))
+            stats.count += 1
+            stats.errors += not event.ok
+            stats.retries += event.retries
+            stats.seconds += event.seconds
+            stats.max_seconds = max(stats.max_seconds, event.seconds)
+            stats.request_bytes += event.request_bytes or 0
+            stats.response_bytes += event.response_bytes or 0
+            stats.buckets[bisect.bisect_left(self.buckets, event.seconds)] += 1
+            stats.statuses[event.status] = stats.statuses.get(event.status, 0) + 1
+    # Estimates a percentile of latency from a histogram
+    def _percentile(self, stats, q):
+        target = q * stats.count
+        seen = 0
+        for bound, n in zip(self.buckets, stats.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, stats.max_seconds)
+        return stats.max_seconds
+    # Returns a list of dicts, one per endpoint, with its request count, error rate, retries, latency (mean and percentiles), and bytes
+    def summary(self):
+        with self._lock:
+            return [{"kind": kind, "method": method, "endpoint": endpoint,
+                     "count": s.count, "errors": s.errors, "error_rate": s.errors / s.count, "retries": s.retries,
+                     "mean_seconds": s.seconds / s.count, "p50_seconds": self._percentile(s, 0.5),
+                     "p95_seconds": self._percentile(s, 0.95), "p99_seconds": self._percentile(s, 0.99), "max_seconds": s.max_seconds,
+                     "request_bytes": s.request_bytes, "response_bytes": s.response_bytes, "statuses": dict(s.statuses)}
+                    for (kind, method, endpoint), s in self._stats.items()]
+    # Returns the summary as a pandas DataFrame, with one row per endpoint
+    def to_dataframe(self):
+        import pandas
+        return pandas.DataFrame(self.summary())
+    # Removes everything recorded so far
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+# Class type for LoggingHooks, a hook that logs every event to a logging.Logger, with its fields under the "felt" attribute of the record
+# logger: the Logger to log to - by default, the "feltpy" logger
+# level: the level to log successful requests at
+# error_level: the level to log requests that failed (4xx, 5xx, or no response) at
+class LoggingHook:
+    # Info is created on initialization
+    def __init__(self, logger: logging.Logger=None, level: int=logging.DEBUG, error_level: int=logging.WARNING):
+        self.logger = logger or logging.getLogger("feltpy")
+        self.level = level
+        self.error_level = error_level
+    # Logs an event
+    def __call__(self, event):
+        level = self.level if event.ok else self.error_level
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, "%s %s %s in %.3fs (%s retries)", event.method, event.endpoint, event.status or event.error,
+                            event.seconds, event.retries, extra={"felt": event.as_dict()})
 
 ### CLASSES ###
 # Objects that contain attributes    
@@ -431,85 +1931,122 @@ class Map:
         return getMapElements(pat, self.id)
     def getMapComments(self, pat):
         return getMapComments(pat, self.id)
+    def exportMapComments(self, pat, destination):
+        return exportMapComments(pat, self.id, destination)
     def getMapLayers(self, pat):
         return getLayers(pat, self.id)
     def deleteMap(self, pat):
-        deleteMap(pat, self.id)
+        return deleteMap(pat, self.id)
 
 # Class type for LayerCollection (all layers within a single map)
 # Has attributes for map_id, names, layer_ids, types
 # Also has a method for printing out all the layer information in a digestible manner
+# NOTE: the Layers are only created from the JSON the first time one is asked for, and are then indexed by ID and name
 class LayerCollection:
+    __slots__ = ("map_id", "_json", "_layers", "_by_id", "_by_name")
     # Info is created on initialization
     def __init__(self, map_id, layers):
         self.map_id = map_id
-        self.layer_names = []
-        self.layer_ids = []
-        self.layer_types = []
-        self._layers = [self._make_layer(l) for l in layers["data"]]
-    # Function to parse a JSON object per-Layer information, and create the Layer class
-    def _make_layer(self, layer_json):
-        # Making the layer
-        layer =  Layer(type = layer_json["type"],
-                       id = layer_json["id"],
-                       name = layer_json["attributes"]["name"],
-                       status = layer_json["attributes"]["status"],
-                       map_id = self.map_id,
-                       datasets = layer_json["relationships"]["datasets"])
-        # Appending the info to each attribute
-        self.layer_names.append(layer.name)
-        self.layer_ids.append(layer.id)
-        self.layer_types.append(layer.type)
-        # Finally, returning the actual layer, to be added to the list
-        return layer
+        self._json = layers["data"]
+        self._layers = None
+        self._by_id = None
+        self._by_name = None
+    # Function to create every Layer from the JSON, along with the indexes to find them by
+    def _parse(self):
+        if self._layers is None:
+            layers = [_layerFromJSON(l, self.map_id) for l in self._json]
+            self._by_id = {l.id: l for l in layers}
+            # If several layers share a name, the first one is kept
+            self._by_name = {}
+            for l in layers:
+                self._by_name.setdefault(l.name, l)
+            self._layers = layers
+        return self._layers
+    # Lists of each layer's information, read straight from the JSON
+    @property
+    def layer_names(self):
+        return [l["attributes"]["name"] for l in self._json]
+    @property
+    def layer_ids(self):
+        return [l["id"] for l in self._json]
+    @property
+    def layer_types(self):
+        return [l["type"] for l in self._json]
     # Method for pretty-printing the layers
     def listLayers(self):
         for i, n in zip(self.layer_ids, self.layer_names):
             print(i, n)
+    # Method for returning the layers' information as a pandas DataFrame, with one row per layer
+    def to_dataframe(self):
+        import pandas
+        return pandas.DataFrame({
+            "id": self.layer_ids,
+            "name": self.layer_names,
+            "type": self.layer_types,
+            "status": [l["attributes"]["status"] for l in self._json],
+            "description": [l["attributes"].get("description") for l in self._json],
+            "visible": [l["attributes"].get("visible") for l in self._json],
+            "map_id": [self.map_id] * len(self._json),
+            "n_datasets": [len((l["relationships"]["datasets"] or {}).get("data") or []) for l in self._json]
+        })
     # Methods for returning a specific layer
     # Using square brackets, like LayerCollection[0]:
     def __getitem__(self, index):
-        return self._layers[index]
+        return self._parse()[index]
+    def __len__(self):
+        return len(self._json)
+    def __iter__(self):
+        return iter(self._parse())
     # Using the ID of the layer
     def getLayer(self, id):
-        for i, l in zip(self.layer_ids, self._layers):
-            if i == id:
-                return l 
-            else:
-                pass
+        self._parse()
+        return self._by_id.get(id)
+    # Using the name of the layer
+    def getLayerByName(self, name):
+        self._parse()
+        return self._by_name.get(name)
 
 # Class type for Layers (created when data is uploaded to a map)
-# Has attributes for type, id, name, status, and datasets
+# Has attributes for type, id, name, status, description, visible, and datasets
+# NOTE: description and visible are None when Felt did not include them
+# Layers returned by postLayer also have a list of FileUploads under uploads (and, if geometries were reduced, of GeometryReductions under reductions)
 # Also has a method for printing out all the layer information in a digestible manner
 # And has methods to call all layer-based functions
+# NOTE: the Datasets are only created from the JSON the first time one is asked for, and are then indexed by ID
 # TODO: Should map_id be stored here?
 class Layer:
+    __slots__ = ("type", "id", "name", "status", "description", "visible", "map_id", "uploads", "reductions", "_datasets_json", "_datasets", "_by_id")
     # Info is created on initialization
-    def __init__(self, type, id, name, status, map_id, datasets):
+    def __init__(self, type, id, name, status, map_id, datasets, uploads=None, description=None, visible=None, reductions=None):
         self.type = type 
         self.id = id 
         self.name = name 
         self.status = status
+        self.description = description
+        self.visible = visible
         self.map_id = map_id
-        self.dataset_names = []
-        self.dataset_ids = []
-        self.dataset_types = []
-        if datasets:
-            self._datasets = [self._make_dataset(d) for d in datasets["data"]]
-        else:
-            self._datasets = []
-    # Function to parse a JSON object per-Dataset information, and create the Dataset class
-    def _make_dataset(self, dataset_json):
-        # Making the dataset
-        dataset =  Dataset(type = dataset_json["type"],
-                           id = dataset_json["id"],
-                           name = dataset_json["attributes"]["name"])
-        # Appending the info to each attribute
-        self.dataset_names.append(dataset.name)
-        self.dataset_ids.append(dataset.id)
-        self.dataset_types.append(dataset.type)
-        # Finally, returning the actual dataset, to be added to the list
-        return dataset
+        self.uploads = uploads
+        self.reductions = reductions
+        self._datasets_json = datasets["data"] if datasets else []
+        self._datasets = None
+        self._by_id = None
+    # Function to create every Dataset from the JSON, along with the index to find them by
+    def _parse(self):
+        if self._datasets is None:
+            datasets = [Dataset(type = d["type"], id = d["id"], name = d["attributes"]["name"]) for d in self._datasets_json]
+            self._by_id = {d.id: d for d in datasets}
+            self._datasets = datasets
+        return self._datasets
+    # Lists of each dataset's information, read straight from the JSON
+    @property
+    def dataset_names(self):
+        return [d["attributes"]["name"] for d in self._datasets_json]
+    @property
+    def dataset_ids(self):
+        return [d["id"] for d in self._datasets_json]
+    @property
+    def dataset_types(self):
+        return [d["type"] for d in self._datasets_json]
     # Method for pretty-printing the datasets
     def listDatasets(self):
         for i, n in zip(self.dataset_ids, self.dataset_names):
@@ -517,17 +2054,14 @@ class Layer:
     # Methods for returning a specific layer
     # Using square brackets, like LayerCollection[0]:
     def __getitem__(self, index):
-        return self._datasets[index]
+        return self._parse()[index]
     # Using the ID of the layer
     def getDataset(self, id):
-        for i, l in zip(self.dataset_ids, self._datasets):
-            if i == id:
-                return l 
-            else:
-                pass
+        self._parse()
+        return self._by_id.get(id)
     
     # Methods to perform Layer actions (patch, delete)
-    def patchLayer(self, pat, name: str=None, description: str=None, visible: str=None):
+    def patchLayer(self, pat, name: str=None, description: str=None, visible: bool=None):
         return patchLayer(pat, self.map_id, self.id, name, description, visible)
     def deleteLayer(self, pat):
         return deleteLayer(pat, self.map_id, self.id)
@@ -536,8 +2070,117 @@ class Layer:
 # Has attributes for type, id, and name
 # TODO: Add layer_id?
 class Dataset:
+    __slots__ = ("type", "id", "name")
     # Info is created on initialization
     def __init__(self, type, id, name):
         self.type = type
         self.id = id
-        self.name = name
\ No newline at end of file
+        self.name = name
+
+# Class type for FileUploads (a single file sent to the cloud by postLayer)
+# Has attributes for file_name, bytes (how large the file was), seconds (how long it took to encode and send),
+# status (the HTTP status code of the upload), error (None if the upload was successful), and attempts
+class FileUpload:
+    # Info is created on initialization
+    def __init__(self, file_name, bytes, seconds, status, error=None, attempts=1):
+        self.file_name = file_name
+        self.bytes = bytes
+        self.seconds = seconds
+        self.status = status
+        self.error = error
+        self.attempts = attempts
+
+# Class type for BatchResults (the outcome for one item of patchLayers, deleteLayers, or deleteMaps)
+# Has attributes for item (what was passed in), status (the HTTP status code, or None if no answer was received),
+# error (None if successful), value (e.g. the updated Layer), seconds (how long it took),
+# and confirmed (whether a deletion was confirmed by re-querying - None if not checked)
+class BatchResult:
+    __slots__ = ("item", "status", "error", "value", "seconds", "confirmed")
+    # Info is created on initialization
+    def __init__(self, item, status, error=None, value=None, seconds=None, confirmed=None):
+        self.item = item
+        self.status = status
+        self.error = error
+        self.value = value
+        self.seconds = seconds
+        self.confirmed = confirmed
+    # Whether the request was successful
+    @property
+    def ok(self):
+        return self.error is None
+
+# Class type for UploadManifests (a record, kept on disk, of what was last uploaded to each layer by postLayer)
+# Has an attribute for path (the JSON file the manifest is kept in), which can be shared between processes
+# Each entry is keyed by map ID and layer name, and holds the hash of the data, the layer's ID, and when it was uploaded
+class UploadManifest:
+    __slots__ = ("path",)
+    # Info is created on initialization
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+    # The key of an entry
+    @staticmethod
+    def _key(map_id, name):
+        return f"{map_id}/{name}"
+    # Returns the entry for a layer, or None if nothing was recorded for it (without creating or changing the file)
+    # Raises a ValueError if the file is not valid JSON, rather than losing every entry
+    def lookup(self, map_id, name: str):
+        return _readState(self.path).get(self._key(map_id, name))
+    # Returns every entry, keyed by "map_id/layer name", read from the file once
+    def entries(self):
+        return _readState(self.path)
+    # Records that data with the given hash was uploaded to a layer
+    def record(self, map_id, name: str, digest: str, layer_id):
+        with _lockedState(self.path) as state:
+            state[self._key(map_id, name)] = {"hash": digest, "layer_id": layer_id, "uploaded": time.time()}
+    # Removes the entry for a layer, so that its data is uploaded again next time
+    def forget(self, map_id, name: str):
+        with _lockedState(self.path) as state:
+            state.pop(self._key(map_id, name), None)
+
+# Class type for RequestEvents (a single request to the Felt API, or upload of a file, as passed to hooks)
+# Has attributes for kind ("request" or "upload"), method, endpoint (a template such as "maps/{map_id}/layers", or "upload"),
+# status (the HTTP status code, or None if no response was received), seconds (how long it took, including retries and rate limiting),
+# waited (how much of that was spent waiting on the rate limiter), request_bytes and response_bytes (None if not known),
+# retries (how many times it was retried), and error (the exception, if no response was received)
+class RequestEvent:
+    __slots__ = ("kind", "method", "endpoint", "status", "seconds", "waited", "request_bytes", "response_bytes", "retries", "error")
+    # Info is created on initialization
+    def __init__(self, kind, method, endpoint, status, seconds, waited, request_bytes, response_bytes, retries, error=None):
+        self.kind = kind
+        self.method = method
+        self.endpoint = endpoint
+        self.status = status
+        self.seconds = seconds
+        self.waited = waited
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.retries = retries
+        self.error = error
+    # Whether a response was received, and it was not an error
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and self.status < 400
+    # Returns the event as a dict
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+    def __repr__(self):
+        return f"RequestEvent({self.method} {self.endpoint} {self.status} in {self.seconds:.3f}s)"
+
+# Class type for GeometryReductions (how much smaller postLayer made a GeoDataFrame's geometries, with precision and/or simplify)
+# Has attributes for vertices_before, vertices_after, bytes_before, and bytes_after (the size of the geometries as GeoJSON)
+class GeometryReduction:
+    __slots__ = ("vertices_before", "vertices_after", "bytes_before", "bytes_after")
+    # Info is created on initialization
+    def __init__(self, vertices_before, vertices_after, bytes_before, bytes_after):
+        self.vertices_before = vertices_before
+        self.vertices_after = vertices_after
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+    # How many bytes of GeoJSON were saved
+    @property
+    def bytes_saved(self):
+        return self.bytes_before - self.bytes_after
+    def __repr__(self):
+        saved = self.bytes_saved / self.bytes_before if self.bytes_before else 0.0
+        return (f"Reduced geometries from {self.vertices_before} to {self.vertices_after} vertices, "
+                f"and {self.bytes_before} to {self.bytes_after} bytes of GeoJSON ({saved:.0%} smaller)")
@@ -0,0 +1,349 @@
+# FeltPy mock server: a local stand-in for the Felt API, for trying out and benchmarking the package without a Felt account
+# Keeps maps, layers, elements, and comments in memory, and accepts uploads to a presigned-upload sink that only counts the bytes
+# Can add latency, rate limits (429s), and server errors (5xx) to a share of requests, to see how clients cope with them
+# Can be started from Python, or from the command line with: python -m feltpy.mockserver --port 8080
+
+# Importing other useful packages
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+### DATA ###
+# What the server hands back
+
+# Purpose: make a FeatureCollection of points, for the elements of a map
+# n: how many features to make
+# seed: the seed for the random coordinates
+# Returns the FeatureCollection as a dict
+def _makeElements(n: int, seed: int=0):
+    rng = random.Random(seed)
+    return {"type": "FeatureCollection",
+            "features": [{"type": "Feature",
+                          "geometry": {"type": "Point", "coordinates": [round(rng.uniform(-180, 180), 6), round(rng.uniform(-85, 85), 6)]},
+                          "properties": {"felt:id": f"e{i}", "felt:type": "Place", "felt:color": "#C93535", "felt:text": f"Element {i}"}}
+                         for i in range(n)]}
+
+# Purpose: make comment threads, for the comments of a map
+# n: how many threads to make, each with up to two replies
+# Returns a list of threads
+def _makeComments(n: int):
+    return [{"id": f"t{i}", "comments": [{"id": f"t{i}c{j}", "author": "Mock User", "text": f"Comment {j} on thread {i}",
+                                          "created_at": "2023-07-28T12:00:00Z"} for j in range(1 + i % 3)]}
+            for i in range(n)]
+
+# Purpose: turn comment threads into the CSV export of them
+# threads: the list of threads
+# Returns the CSV as bytes
+def _commentsCSV(threads):
+    lines = ["thread_id,id,author,text,created_at"]
+    for thread in threads:
+        for comment in thread["comments"]:
+            lines.append(",".join([thread["id"], comment["id"], comment["author"], comment["text"], comment["created_at"]]))
+    return ("\n".join(lines) + "\n").encode()
+
+# Purpose: describe a layer the way the Felt API does
+# layer: the layer's dict
+# Returns the JSON object for the layer
+def _layerJSON(layer):
+    return {"type": "layer", "id": layer["id"],
+            "attributes": {"name": layer["name"], "status": layer["status"], "description": layer["description"], "visible": layer["visible"]},
+            "relationships": {"datasets": {"data": layer["datasets"]}}}
+
+### SERVER ###
+# The server itself
+
+# Class type for MockFeltServers, which answer requests like the Felt API from a background thread
+# host, port: where to listen - a port of 0 picks a free one
+# latency: seconds to wait before answering each API request, either a number or a (min, max) range to pick from at random
+# throttle_rate: the share of API requests (0 to 1) that are answered with a 429
+# retry_after: the Retry-After (in seconds) sent with each 429
+# error_rate: the share of API requests (0 to 1) that are answered with a 503
+# processing_time: seconds that a layer stays "processing" after finish_upload, before it is "completed"
+# seed: the seed for deciding which requests get a 429 or 503, so that runs can be repeated
+# Has attributes for maps (every map, by ID), requests (how many API requests were received), and uploaded_bytes (how much was sent to the upload sink)
+# Can be used as a context manager, which starts the server, and stops it on exit
+class MockFeltServer:
+    # Info is created on initialization
+    def __init__(self, host: str="127.0.0.1", port: int=0, latency=0.0, throttle_rate: float=0.0, retry_after: float=1.0,
+                 error_rate: float=0.0, processing_time: float=0.0, seed: int=0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.processing_time = processing_time
+        self.maps = {}
+        self.requests = 0
+        self.uploaded_bytes = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self._httpd = ThreadingHTTPServer((host, port), _handlerFor(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+    # The base URL of the API, to pass to FeltClient(api_url=...)
+    @property
+    def api_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1/"
+    # The URL that uploads are sent to
+    @property
+    def upload_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/upload"
+    # Starts answering requests from a background thread
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+    # Stops answering requests, and closes the socket
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+    def __enter__(self):
+        return self.start()
+    def __exit__(self, *args):
+        self.stop()
+
+    # Methods to set up the server's data
+    # Adds a map, returning its ID
+    def addMap(self, title: str="Untitled Map", map_id: str=None):
+        map_id = map_id or uuid.uuid4().hex[:12]
+        with self._lock:
+            self.maps[map_id] = {"id": map_id, "title": title, "layers": {}, "elements": _makeElements(0), "comments": []}
+        return map_id
+    # Adds a (completed) layer to a map, returning its ID
+    def addLayer(self, map_id: str, name: str, status: str="completed", description: str=None, visible: bool=True):
+        layer_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.maps[map_id]["layers"][layer_id] = {"id": layer_id, "name": name, "status": status, "description": description,
+                                                     "visible": visible, "datasets": [], "ready_at": None}
+            self._bodies.clear()
+        return layer_id
+    # Replaces the elements of a map with n random points
+    def setElements(self, map_id: str, n: int, seed: int=0):
+        with self._lock:
+            self.maps[map_id]["elements"] = _makeElements(n, seed)
+            self._bodies.clear()
+    # Replaces the comments of a map with n threads
+    def setComments(self, map_id: str, n: int):
+        with self._lock:
+            self.maps[map_id]["comments"] = _makeComments(n)
+            self._bodies.clear()
+
+    # Decides how to answer an API request: returns (status, headers, body), where body is a dict, bytes, or None
+    def _route(self, method, path, data):
+        parts = [p for p in path.split("/") if p]
+        with self._lock:
+            # Layers that are done processing are marked as completed
+            now = time.monotonic()
+            for m in self.maps.values():
+                for layer in m["layers"].values():
+                    if layer["ready_at"] is not None and now >= layer["ready_at"]:
+                        layer["status"], layer["ready_at"] = "completed", None
+                        self._bodies.clear()
+            if parts == ["user"] and method == "GET":
+                return 200, {}, {"data": {"type": "user", "id": "mock-user", "attributes": {"name": "Mock User", "email": "mock@example.com"}}}
+            if parts == ["maps"] and method == "POST":
+                map_id = uuid.uuid4().hex[:12]
+                self.maps[map_id] = {"id": map_id, "title": data.get("title") or "Untitled Map", "layers": {}, "elements": _makeElements(0), "comments": []}
+                return 200, {}, {"data": self._mapJSON(map_id)}
+            if len(parts) < 2 or parts[0] != "maps":
+                return 404, {}, _error("Not Found", f"No route for {method} /{path}")
+            m = self.maps.get(parts[1])
+            if m is None:
+                return 404, {}, _error("Not Found", "Map not found")
+            rest = parts[2:]
+            if not rest:
+                if method == "GET":
+                    return 200, {}, {"data": self._mapJSON(m["id"])}
+                if method == "DELETE":
+                    del self.maps[m["id"]]
+                    self._bodies.clear()
+                    return 204, {}, None
+            elif rest == ["elements"] and method == "GET":
+                return 200, {}, self._cachedBody(("elements", m["id"]), lambda: {"data": m["elements"]})
+            elif rest == ["comments", "export"] and method == "GET":
+                if "format=csv" in data.get("_query", ""):
+                    return 200, {"Content-Type": "text/csv"}, self._cachedBody(("csv", m["id"]), lambda: _commentsCSV(m["comments"]))
+                return 200, {}, self._cachedBody(("comments", m["id"]), lambda: {"data": m["comments"]})
+            elif rest == ["layers"] and method == "GET":
+                return 200, {}, self._cachedBody(("layers", m["id"]), lambda: {"data": [_layerJSON(l) for l in m["layers"].values()]})
+            elif rest == ["layers"] and method == "POST":
+                layer_id = self._newLayer(m, data.get("name"), "uploading")
+                return 200, {}, {"data": {"type": "presigned_upload", "attributes": {
+                    "url": self.upload_url, "layer_id": layer_id,
+                    "presigned_attributes": {"key": f"uploads/{layer_id}/${{filename}}", "policy": "mock", "x-amz-signature": "mock"}}}}
+            elif rest == ["layers", "url_import"] and method == "POST":
+                layer_id = self._newLayer(m, data.get("name"), "processing")
+                m["layers"][layer_id]["ready_at"] = time.monotonic() + self.processing_time
+                return 200, {}, {"data": _layerJSON(m["layers"][layer_id])}
+            elif len(rest) >= 2 and rest[0] == "layers":
+                layer = m["layers"].get(rest[1])
+                if layer is None:
+                    return 404, {}, _error("Not Found", "Layer not found")
+                self._bodies.pop(("layers", m["id"]), None)
+                if rest[2:] == ["finish_upload"] and method == "POST":
+                    layer["status"], layer["ready_at"] = "processing", time.monotonic() + self.processing_time
+                    return 200, {}, {"data": None}
+                if len(rest) == 2 and method == "GET":
+                    return 200, {}, {"data": _layerJSON(layer)}
+                if len(rest) == 2 and method == "PATCH":
+                    for k in ("name", "description", "visible"):
+                        if k in data:
+                            layer[k] = data[k]
+                    return 200, {}, {"data": _layerJSON(layer)}
+                if len(rest) == 2 and method == "DELETE":
+                    del m["layers"][layer["id"]]
+                    return 204, {}, None
+            return 404, {}, _error("Not Found", f"No route for {method} /{path}")
+    # The JSON object for a map
+    def _mapJSON(self, map_id):
+        return {"type": "map", "id": map_id, "attributes": {"title": self.maps[map_id]["title"], "url": f"https://felt.com/map/{map_id}"}}
+    # Adds a layer while the lock is held, returning its ID
+    def _newLayer(self, m, name, status):
+        layer_id = uuid.uuid4().hex[:12]
+        m["layers"][layer_id] = {"id": layer_id, "name": name or "Untitled Layer", "status": status, "description": None,
+                                 "visible": True, "datasets": [], "ready_at": None}
+        self._bodies.pop(("layers", m["id"]), None)
+        return layer_id
+    # Large bodies are only encoded once, until the data behind them changes
+    def _cachedBody(self, key, make):
+        body = self._bodies.get(key)
+        if body is None:
+            body = make()
+            body = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self._bodies[key] = body
+        return body
+    # Decides whether a request gets a 429 or a 503 instead of an answer
+    def _fault(self):
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+    # How long to wait before answering
+    def _delay(self):
+        if isinstance(self.latency, (tuple, list)):
+            with self._lock:
+                return self._random.uniform(*self.latency)
+        return self.latency
+
+# Purpose: build the body of a Felt error response
+def _error(title, detail):
+    return {"errors": [{"title": title, "detail": detail}]}
+
+# Purpose: make the request handler class for a MockFeltServer
+# server: the MockFeltServer whose data the handler answers from
+# Returns a BaseHTTPRequestHandler subclass
+def _handlerFor(server):
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately, which would otherwise be held back waiting for an ACK
+        disable_nagle_algorithm = True
+        # Requests are not logged to stderr
+        def log_message(self, *args):
+            pass
+        # Reads the body of the request in pieces, handing each one to consume
+        def _readBody(self, consume):
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return
+                    consume(self.rfile.read(size))
+                    self.rfile.readline()
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining > 0:
+                piece = self.rfile.read(min(remaining, 1024*1024))
+                if not piece:
+                    return
+                remaining -= len(piece)
+                consume(piece)
+        # Sends a response, with an ETag for GETs so that clients can revalidate their cache
+        def _send(self, status, headers, body):
+            if isinstance(body, dict):
+                body = json.dumps(body).encode()
+            body = body or b""
+            if self.command == "GET" and status == 200:
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+                headers = {**headers, "ETag": etag}
+            self.send_response(status)
+            if body:
+                self.send_header("Content-Type", headers.pop("Content-Type", "application/json"))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def _handle(self):
+            path, _, query = self.path.partition("?")
+            # The upload sink only counts what it was sent
+            if path == "/upload" and self.command == "POST":
+                received = [0]
+                self._readBody(lambda piece: received.__setitem__(0, received[0] + len(piece)))
+                with server._lock:
+                    server.uploaded_bytes += received[0]
+                return self._send(204, {}, None)
+            chunks = []
+            self._readBody(chunks.append)
+            if not path.startswith("/api/v1/"):
+                return self._send(404, {}, _error("Not Found", f"No route for {self.command} {path}"))
+            if server.latency:
+                time.sleep(server._delay())
+            fault = server._fault()
+            if fault == 429:
+                return self._send(429, {"Retry-After": f"{server.retry_after:g}"}, _error("Too Many Requests", "Rate limit exceeded"))
+            if fault == 503:
+                return self._send(503, {}, _error("Service Unavailable", "Injected server error"))
+            try:
+                data = json.loads(b"".join(chunks) or b"{}")
+            except ValueError:
+                return self._send(400, {}, _error("Bad Request", "Body is not valid JSON"))
+            data = data if isinstance(data, dict) else {}
+            data["_query"] = query
+            status, headers, body = server._route(self.command, path[len("/api/v1/"):], data)
+            self._send(status, headers, body)
+        do_GET = do_POST = do_PATCH = do_DELETE = _handle
+    return _Handler
+
+# Purpose: run a MockFeltServer from the command line until interrupted
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m feltpy.mockserver", description="Run a local stand-in for the Felt API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering each request")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--processing-time", type=float, default=0.0, help="seconds a layer takes to process")
+    parser.add_argument("--elements", type=int, default=1000, help="how many elements the example map has")
+    args = parser.parse_args(argv)
+    server = MockFeltServer(args.host, args.port, args.latency, args.throttle_rate, 1.0, args.error_rate, args.processing_time)
+    map_id = server.addMap("Example Map", map_id="example")
+    server.setElements(map_id, args.elements)
+    server.setComments(map_id, 10)
+    server.addLayer(map_id, "Example Layer")
+    print(f"Mock Felt API at {server.api_url} (example map ID: {map_id})")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
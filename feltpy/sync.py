@@ -0,0 +1,256 @@
+# FeltPy sync: describe a map (and its layers) as code, and bring the map on Felt in line with it
+# The map's current state is read once, the fewest API calls needed are worked out as a SyncPlan,
+# and then the steps of the plan are run, with steps that don't depend on each other run at the same time
+
+# Importing other useful packages
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .feltpy import (_print, _getClient, _getRequest, _batchRequest, _layerPatchData, _contentHash,
+                     LayerCollection, UploadManifest, postMap, postLayer, postWebLayer)
+
+### SPECS ###
+# How a map should look
+
+# Class type for LayerSpecs (one layer that should be on the map)
+# name: the name of the layer, which is how it is matched to the layers already on the map
+# source: where the layer's data comes from - a path, a GeoDataFrame, a list of them (see postLayer), or a URL (see postWebLayer)
+# NOTE: source is only uploaded when the layer does not exist yet, or, if a manifest is used, when its data has changed
+# description: the description the layer should have (None to leave it as is)
+# visible: whether the layer should be visible (None to leave it as is)
+# options: any other arguments to pass to postLayer when uploading, such as format or shards
+class LayerSpec:
+    # Info is created on initialization
+    def __init__(self, name: str, source=None, description: str=None, visible: bool=None, options: dict=None):
+        self.name = name
+        self.source = source
+        self.description = description
+        self.visible = visible
+        self.options = options or {}
+    # Whether the source is a URL, to be uploaded with postWebLayer
+    def _isURL(self):
+        return isinstance(self.source, str) and self.source.startswith(("http://", "https://"))
+    # The fields that can be updated with patchLayer, leaving out the ones that were not given
+    def _fields(self):
+        return _layerPatchData(description=self.description, visible=self.visible)
+
+# Class type for MapSpecs (a map, and the layers that should be on it)
+# title: the title of the map
+# basemap, lat, lon, zoom: how the map is set up (see postMap)
+# NOTE: the API can't update a map once it is made, so basemap, lat, lon, and zoom are only used when the map is created
+# layers: a list of LayerSpecs, each with a different name
+# map_id: the ID of the map, if it already exists - if None, a new map is created
+class MapSpec:
+    # Info is created on initialization
+    def __init__(self, title: str=None, basemap: str="default", layers: list=None, map_id=None, lat: float=0.0, lon: float=0.0, zoom: float=10.0):
+        self.title = title
+        self.basemap = basemap
+        self.layers = layers or []
+        self.map_id = map_id
+        self.lat = lat
+        self.lon = lon
+        self.zoom = zoom
+
+### PLANS ###
+# The API calls needed to make a map match its MapSpec
+
+# Class type for SyncSteps (one change to make to the map)
+# action: one of "create_map", "upload" (a new layer), "replace" (upload the layer's changed data, then delete the old layer), "patch", or "delete"
+# name: the name of the layer (or the title of the map, for "create_map")
+# layer_id: the ID of the layer being patched, replaced, or deleted
+# fields: for "patch", only the fields that differ; for "upload" and "replace", the fields to set once the layer is uploaded
+# Once run, also has seconds (how long the step took), error (None if successful), and result (the new Map or Layer, if one was made)
+class SyncStep:
+    __slots__ = ("action", "name", "layer_id", "fields", "seconds", "error", "result", "_spec", "_digest")
+    # Info is created on initialization
+    def __init__(self, action: str, name: str, layer_id=None, fields: dict=None, spec=None, digest: str=None):
+        self.action = action
+        self.name = name
+        self.layer_id = layer_id
+        self.fields = fields or {}
+        self.seconds = None
+        self.error = None
+        self.result = None
+        self._spec = spec
+        self._digest = digest
+    def __repr__(self):
+        text = f"{self.action} {self.name!r}"
+        if self.layer_id:
+            text += f" ({self.layer_id})"
+        if self.fields:
+            text += " " + ", ".join(f"{k}={v!r}" for k, v in self.fields.items())
+        if self.seconds is not None:
+            text += f" - {'failed: ' + self.error if self.error else 'done'} in {self.seconds:.2f}s"
+        return text
+
+# Class type for SyncPlans (every step needed to make a map match its MapSpec)
+# Has attributes for map_id (None until the map is created), steps (a list of SyncSteps),
+# warnings (differences that can't be fixed through the API), and seconds (how long running the plan took, None if not run)
+# Also has a method for printing out the plan in a digestible manner
+class SyncPlan:
+    # Info is created on initialization
+    def __init__(self, map_id, steps: list, warnings: list):
+        self.map_id = map_id
+        self.steps = steps
+        self.warnings = warnings
+        self.seconds = None
+    # Whether every step that was run was successful
+    @property
+    def ok(self):
+        return all(step.error is None for step in self.steps)
+    # Method for pretty-printing the plan
+    def listSteps(self):
+        print(self)
+    def __str__(self):
+        lines = [repr(step) for step in self.steps] or ["Nothing to change"]
+        return "\n".join(lines + [f"Warning: {warning}" for warning in self.warnings])
+    def __len__(self):
+        return len(self.steps)
+    def __iter__(self):
+        return iter(self.steps)
+
+# Purpose: work out the changes needed to make a map match its MapSpec, without changing anything
+# pat: the user's personal access token, or a FeltClient
+# spec: the MapSpec
+# prune: whether to delete layers on the map that are not in the spec
+# manifest: an UploadManifest (or the path of one) - if given, layers whose source data changed since it was last uploaded are replaced
+# Returns a SyncPlan, or None if the map's current state could not be read
+# NOTE: reads the map and its layers once; the patch steps only include the fields that actually differ
+def planSync(pat, spec: MapSpec, prune: bool=False, manifest=None):
+    if manifest is not None and not isinstance(manifest, UploadManifest):
+        manifest = UploadManifest(manifest)
+    names = [l.name for l in spec.layers]
+    if len(set(names)) != len(names):
+        _print("Layers must all have different names - rename and retry")
+        return None
+    steps = []
+    warnings = []
+    # Reading the map's current state, skipping the cache so the plan is based on what is there now
+    if spec.map_id is None:
+        steps.append(SyncStep("create_map", spec.title))
+        current = LayerCollection(None, {"data": []})
+    else:
+        map_info = _getRequest(pat, f"maps/{spec.map_id}", use_cache=False)
+        layers = _getRequest(pat, f"maps/{spec.map_id}/layers", use_cache=False)
+        if not map_info or layers is None:
+            return None
+        if spec.title is not None and map_info["data"]["attributes"]["title"] != spec.title:
+            warnings.append(f"map title is {map_info['data']['attributes']['title']!r}, not {spec.title!r}, and can't be updated through the API")
+        current = LayerCollection(spec.map_id, layers)
+    # Working out what each layer needs
+    for layer_spec in spec.layers:
+        existing = current.getLayerByName(layer_spec.name)
+        digest = None
+        if manifest is not None and layer_spec.source is not None and not layer_spec._isURL():
+            digest = _contentHash(layer_spec.source if isinstance(layer_spec.source, (list, tuple)) else [layer_spec.source],
+                                  layer_spec.options.get("chunk_size", 50000))
+        if existing is None:
+            if layer_spec.source is None:
+                warnings.append(f"layer {layer_spec.name!r} is not on the map, and has no source to upload it from")
+            else:
+                steps.append(SyncStep("upload", layer_spec.name, fields=layer_spec._fields(), spec=layer_spec, digest=digest))
+            continue
+        # Replacing the layer if its data changed (or was never recorded) since it was last uploaded
+        if digest is not None:
+            entry = manifest.lookup(current.map_id, layer_spec.name)
+            if not entry or entry["hash"] != digest or entry["layer_id"] != existing.id:
+                steps.append(SyncStep("replace", layer_spec.name, existing.id, layer_spec._fields(), layer_spec, digest))
+                continue
+        # Otherwise, only updating the fields that differ
+        fields = {k: v for k, v in layer_spec._fields().items() if getattr(existing, k) != v}
+        if fields:
+            steps.append(SyncStep("patch", layer_spec.name, existing.id, fields))
+    if prune:
+        for layer in current:
+            if layer.name not in names:
+                steps.append(SyncStep("delete", layer.name, layer.id))
+    return SyncPlan(spec.map_id, steps, warnings)
+
+### RUNNING ###
+# Making the changes
+
+# Purpose: run a single step of a SyncPlan (run in a worker thread by sync)
+# pat: the user's personal access token, or a FeltClient
+# step: the SyncStep
+# map_id: the ID of the map
+# manifest: the UploadManifest to record uploads in, or None
+# Does not return anything, but sets the step's error and result
+def _runStep(pat, step, map_id, manifest):
+    client = _getClient(pat)
+    if step.action in ("upload", "replace"):
+        layer_spec = step._spec
+        if layer_spec._isURL():
+            layer = postWebLayer(pat, map_id, layer_spec.source, layer_spec.name)
+        else:
+            layer = postLayer(pat, map_id, layer_spec.source, layer_spec.name, **{"verbose": False, **layer_spec.options})
+        if layer is None:
+            step.error = "upload failed"
+            return
+        step.result = layer
+        if step._digest is not None:
+            manifest.record(map_id, layer_spec.name, step._digest, layer.id)
+        if step.fields:
+            status, body, error = _batchRequest(client, "PATCH", f"maps/{map_id}/layers/{layer.id}", step.fields)
+            if error:
+                step.error = f"uploaded as {layer.id}, but could not be updated: {error}"
+                return
+    if step.action == "patch":
+        status, body, error = _batchRequest(client, "PATCH", f"maps/{map_id}/layers/{step.layer_id}", step.fields)
+        step.error = error
+    # The old layer is only deleted once the new one is uploaded
+    if step.action in ("replace", "delete"):
+        status, body, error = _batchRequest(client, "DELETE", f"maps/{map_id}/layers/{step.layer_id}")
+        step.error = error
+
+# Purpose: runs a step, timing it and catching any error
+def _timedStep(pat, step, map_id, manifest):
+    start = time.perf_counter()
+    try:
+        _runStep(pat, step, map_id, manifest)
+    except Exception as e:
+        step.error = repr(e)
+    step.seconds = time.perf_counter() - start
+    return step
+
+# Purpose: make a map on Felt match its MapSpec, using as few API calls as possible
+# pat: the user's personal access token, or a FeltClient
+# spec: the MapSpec
+# dry_run: whether to only work out the plan, without changing anything
+# prune: whether to delete layers on the map that are not in the spec
+# manifest: an UploadManifest (or the path of one) - if given, layers whose source data changed since it was last uploaded are replaced
+# workers: how many steps to run at the same time
+# verbose: whether or not to print out each step (and how long it took)
+# Returns the SyncPlan, with the time taken and any error on each step, or None if the map's current state could not be read
+# NOTE: the map is created first (if needed), then every layer's steps run at the same time, as each one touches a different layer
+def sync(pat, spec: MapSpec, dry_run: bool=False, prune: bool=False, manifest=None, workers: int=4, verbose: bool=True):
+    if manifest is not None and not isinstance(manifest, UploadManifest):
+        manifest = UploadManifest(manifest)
+    plan = planSync(pat, spec, prune, manifest)
+    if plan is None or dry_run:
+        if plan is not None and verbose:
+            _print(plan)
+        return plan
+    start = time.perf_counter()
+    steps = plan.steps
+    # Creating the map first, as every other step needs its ID
+    if steps and steps[0].action == "create_map":
+        step = steps[0]
+        step_start = time.perf_counter()
+        step.result = postMap(pat, spec.title, spec.basemap, [], spec.lat, spec.lon, spec.zoom)
+        step.seconds = time.perf_counter() - step_start
+        if step.result is None:
+            step.error = "map could not be created"
+            plan.seconds = time.perf_counter() - start
+            if verbose:
+                _print(plan)
+            return plan
+        plan.map_id = step.result.id
+        steps = steps[1:]
+    if steps:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(steps)))) as executor:
+            list(executor.map(lambda step: _timedStep(pat, step, plan.map_id, manifest), steps))
+    plan.seconds = time.perf_counter() - start
+    if verbose:
+        _print(plan)
+        _print(f"Synced in {plan.seconds:.2f}s")
+    return plan
@@ -0,0 +1,29 @@
+# Checks that the default clients of feltpy.aio are shared within an event loop, and closed once the loop shuts down
+
+import asyncio
+import gc
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from feltpy import aio
+from feltpy.mockserver import MockFeltServer
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockFeltServer() as server:
+        monkeypatch.setattr(aio._feltpy, "_felt_api", server.api_url + "/{endpoint}")
+        yield server
+
+def test_default_clients_are_shared_and_closed_with_the_loop(server):
+    map_id = server.addMap("Map")
+    async def main():
+        await asyncio.gather(*[aio.getLayers("token", map_id) for _ in range(10)])
+        clients = aio._default_clients[asyncio.get_running_loop()][0]
+        return list(clients.values())
+    for _ in range(3):
+        clients = asyncio.run(main())
+        assert len(clients) == 1 and clients[0]._session is None
+    gc.collect()
+    assert aio._default_clients == {}
@@ -0,0 +1,26 @@
+# Checks which files feltpy upload picks up from directories and glob patterns
+
+import os
+
+from feltpy.cli import _findFiles
+
+# Purpose: make empty files with the given names in a directory
+def _touch(directory, *names):
+    for name in names:
+        open(os.path.join(directory, name), "w").close()
+
+def test_only_uploadable_files_are_found(tmp_path):
+    _touch(tmp_path, "a.geojson", "b.GPKG", "c.shp.zip", "notes.txt", "export.geojsonl", ".hidden.geojson")
+    found = [os.path.basename(p) for p in _findFiles([str(tmp_path)])]
+    assert found == ["a.geojson", "b.GPKG", "c.shp.zip"]
+    assert _findFiles([str(tmp_path / "*")]) == _findFiles([str(tmp_path)])
+
+def test_manifest_is_never_uploaded(tmp_path):
+    _touch(tmp_path, "a.geojson", "uploads.json", "uploads.json.lock")
+    manifest = str(tmp_path / "uploads.json")
+    found = _findFiles([str(tmp_path), manifest], skip=[manifest, manifest + ".lock"])
+    assert [os.path.basename(p) for p in found] == ["a.geojson"]
+
+def test_pattern_replaces_the_extensions(tmp_path):
+    _touch(tmp_path, "a.geojson", "notes.txt")
+    assert [os.path.basename(p) for p in _findFiles([str(tmp_path)], "*.txt")] == ["notes.txt"]
@@ -0,0 +1,25 @@
+# Checks that map elements are decoded into the same rows, whether as a GeoDataFrame or an Arrow table
+
+import json
+
+import pytest
+
+from feltpy.feltpy import _decodeFeatures
+
+# Purpose: build a response body holding the given features
+def _response(features):
+    return json.dumps({"data": {"type": "FeatureCollection", "features": features}}).encode()
+
+def test_arrow_without_properties():
+    pytest.importorskip("pyarrow")
+    table = _decodeFeatures(_response([{"type": "Feature", "geometry": {"type": "Point", "coordinates": [1, 2]}, "properties": None}]), as_arrow=True)
+    assert table.num_rows == 1 and table.column_names == ["geometry"]
+
+def test_arrow_matches_geodataframe():
+    pytest.importorskip("pyarrow")
+    features = [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [1, 2]}, "properties": {"a": 1}},
+                {"type": "Feature", "geometry": None, "properties": {"b": "x"}}]
+    table = _decodeFeatures(_response(features), as_arrow=True)
+    gdf = _decodeFeatures(_response(features))
+    assert table.column_names == list(gdf.columns) == ["geometry", "a", "b"]
+    assert table.num_rows == len(gdf) == 2
@@ -0,0 +1,24 @@
+# Checks that importing feltpy stays fast, by making sure the heavy geospatial packages are only loaded when they are first used
+# Each import is run in a fresh interpreter, so that packages loaded by other tests (or pytest itself) don't count
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The checkout being tested, so that it is imported rather than an installed copy
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Purpose: import a module in a fresh interpreter
+# module: the name of the module to import
+# Returns the names of the heavy packages that were loaded by the import
+def _loadedAfterImport(module):
+    code = (f"import sys, {module}\n"
+            "print(' '.join(m for m in ('geopandas', 'pandas', 'shapely', 'pyogrio', 'fiona') if m in sys.modules))")
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    return completed.stdout.split()
+
+@pytest.mark.parametrize("module", ["feltpy", "feltpy.cli"])
+def test_import_does_not_load_geopandas(module):
+    assert _loadedAfterImport(module) == []
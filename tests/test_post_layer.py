@@ -0,0 +1,58 @@
+# Checks that postLayer fails cleanly (returning None, without leaving a layer behind or raising) against the local mock server
+
+import pathlib
+import threading
+import time
+
+import pytest
+
+geopandas = pytest.importorskip("geopandas")
+shapely = pytest.importorskip("shapely")
+
+import feltpy
+from feltpy.mockserver import MockFeltServer
+
+@pytest.fixture
+def server():
+    with MockFeltServer() as server:
+        yield server
+
+@pytest.fixture
+def gdf():
+    return geopandas.GeoDataFrame({"value": [1, 2]}, geometry=[shapely.Point(0, 0), shapely.Point(1, 1)], crs=4326)
+
+# Purpose: count the layers on a map of the mock server
+def _layerCount(server, map_id):
+    return len(server.maps[map_id]["layers"])
+
+def test_failed_part_cancels_the_rest(server, gdf, monkeypatch):
+    map_id = server.addMap()
+    client = feltpy.FeltClient("token", api_url=server.api_url)
+    # The first file to be sent fails straight away, while the others are slow, so that the ones still queued get cancelled
+    first = threading.Event()
+    send = feltpy.FeltClient._upload
+    def flaky(self, *args, **kwargs):
+        if not first.is_set():
+            first.set()
+            raise ConnectionError("dropped")
+        time.sleep(0.2)
+        return send(self, *args, **kwargs)
+    monkeypatch.setattr(feltpy.FeltClient, "_upload", flaky)
+    assert feltpy.postLayer(client, map_id, [gdf] * 10, "Layer", verbose=False, retries=0) is None
+
+@pytest.mark.parametrize("file", [[], "geoseries", 42])
+def test_unsupported_input_makes_no_layer(server, gdf, file):
+    map_id = server.addMap()
+    client = feltpy.FeltClient("token", api_url=server.api_url)
+    if file == "geoseries":
+        file = gdf.geometry
+    assert feltpy.postLayer(client, map_id, file, "Layer", verbose=False) is None
+    assert _layerCount(server, map_id) == 0
+
+def test_path_like(server, gdf, tmp_path):
+    map_id = server.addMap()
+    client = feltpy.FeltClient("token", api_url=server.api_url)
+    path = tmp_path / "points.geojson"
+    gdf.to_file(path, driver="GeoJSON")
+    layer = feltpy.postLayer(client, map_id, pathlib.Path(path), "Layer", verbose=False)
+    assert layer is not None and layer.uploads[0].file_name == "points.geojson"